@@ -0,0 +1,225 @@
+"""Benchmark the parsers and the diff loop on scaled bridge dumps.
+
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --save baseline.json
+    python benchmarks/bench_parsers.py --baseline baseline.json --threshold 0.2
+
+Each benchmark reports operations per second, the peak of memory
+allocated during one operation and the entity state writes it flushed.
+With --baseline, the run fails if any benchmark got slower than the
+baseline by more than the threshold. Baselines are only comparable on
+the same machine.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.dumps import load_dumps, scale_sensors, touch  # noqa: E402
+from benchmarks.stand_in import CountingEntity, StandInHass  # noqa: E402
+from custom_components.huesensor.data_manager import HueSensorData  # noqa: E402
+from custom_components.huesensor.hue_api_response import (  # noqa: E402
+    IncrementalParser,
+    parse_hue_api_response,
+    parse_sml,
+)
+
+SIZES = (10, 100, 1000)
+MIN_TIME = 0.5
+
+
+def changing(sensors):
+    """Return a function changing the next eventful sensor on each call."""
+    eventful = [
+        sensor
+        for sensor in sensors
+        if sensor.get("uniqueid")
+        and set(sensor["state"]) & {"presence", "buttonevent", "temperature"}
+    ]
+    ticks = itertools.count()
+    cycle = itertools.cycle(eventful)
+
+    def change():
+        touch(next(cycle), next(ticks))
+
+    return change
+
+
+def bench_parse_full(sensors):
+    """Parse the whole response, as every tick did before incremental parsing."""
+    return lambda: parse_hue_api_response(sensors)
+
+
+def bench_parse_incremental_idle(sensors):
+    """Parse a response where nothing moved since the previous one."""
+    parser = IncrementalParser()
+    parser.parse(sensors)
+    return lambda: parser.parse(sensors)
+
+
+def bench_parse_incremental_event(sensors):
+    """Parse a response with one changed sensor."""
+    parser = IncrementalParser()
+    parser.parse(sensors)
+    change = changing(sensors)
+
+    def run():
+        change()
+        parser.parse(sensors)
+
+    return run
+
+
+def bench_parse_sml(sensors):
+    """Parse one SML resource (presence, light level or temperature)."""
+    sml = itertools.cycle(
+        [sensor for sensor in sensors if sensor["modelid"].startswith("SML")]
+    )
+    return lambda: parse_sml(next(sml))
+
+
+def subscribed_data(sensors):
+    """Return a HueSensorData with entities for all sensors of the response."""
+    data = HueSensorData(StandInHass())
+    data.async_add_platform(
+        ("RWL", "ZGP", "FOH", "SML"),
+        CountingEntity,
+        lambda entities, update_before_add=False: None,
+    )
+    data.process_sensors(sensors)
+    data.async_flush()
+    return data
+
+
+def bench_diff_loop(sensors):
+    """Run one poll tick through HueSensorData with one changed sensor."""
+    data = subscribed_data(sensors)
+    change = changing(sensors)
+
+    def run():
+        change()
+        data.process_sensors(sensors)
+        data.async_flush()
+
+    return run
+
+
+def bench_flush_burst(sensors):
+    """Run a poll tick where every resource of ten motion sensors changed.
+
+    The three resources of a motion sensor make up one entity, so this
+    writes ten entities.
+    """
+    data = subscribed_data(sensors)
+    sml = [sensor for sensor in sensors if sensor["modelid"].startswith("SML")]
+    devices = sorted({sensor["uniqueid"][:-5] for sensor in sml})[:10]
+    burst = [sensor for sensor in sml if sensor["uniqueid"][:-5] in devices]
+    ticks = itertools.count()
+
+    def run():
+        tick = next(ticks)
+        for sensor in burst:
+            touch(sensor, tick)
+        data.process_sensors(sensors)
+        data.async_flush()
+
+    return run
+
+
+BENCHMARKS = (
+    bench_parse_full,
+    bench_parse_incremental_idle,
+    bench_parse_incremental_event,
+    bench_parse_sml,
+    bench_diff_loop,
+    bench_flush_burst,
+)
+
+
+def measure(run):
+    """Return the operations per second and peak allocated bytes of run."""
+    timer = timeit.Timer(run)
+    number, elapsed = timer.autorange()
+    while elapsed < MIN_TIME:
+        number *= 2
+        elapsed = timer.timeit(number)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return number / elapsed, peak
+
+
+def run_benchmarks(sizes=SIZES, names=None):
+    """Run the benchmarks and return their results by name."""
+    template = load_dumps()
+    results = {}
+    for size in sizes:
+        for bench in BENCHMARKS:
+            name = "{}[{}]".format(bench.__name__[len("bench_") :], size)
+            if names and not any(part in name for part in names):
+                continue
+            run = bench(scale_sensors(template, size))
+            ops, peak = measure(run)
+            writes = CountingEntity.writes
+            run()
+            writes = CountingEntity.writes - writes
+            results[name] = {
+                "ops_per_sec": ops,
+                "peak_bytes": peak,
+                "writes_per_op": writes,
+            }
+            print(
+                "{:<36} {:>12.1f} ops/s {:>10} B {:>4} writes".format(
+                    name, ops, peak, writes
+                )
+            )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the names of the benchmarks slower than baseline by threshold."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result["ops_per_sec"] / reference["ops_per_sec"]
+        if ratio < 1 - threshold:
+            print("REGRESSION {}: {:.0%} of baseline".format(name, ratio))
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", help="run benchmarks matching these")
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--baseline", help="compare against this json file")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    results = run_benchmarks(args.sizes, args.only)
+    print("done in {:.1f}s".format(time.monotonic() - started))
+
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            if compare(results, json.load(baseline), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
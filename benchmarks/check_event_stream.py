@@ -0,0 +1,116 @@
+"""Check the event stream client against the fake bridge.
+
+    python benchmarks/check_event_stream.py
+
+Follows the stand-in v2 event stream of the fake bridge with
+HueEventStream, plays one event of each kind on the bridge and checks
+that every pushed resource maps back onto its v1 sensor with
+apply_resource: motion, temperature, light level and dimmer switch
+presses patch the sensor, the presses of the other remotes can't be
+expressed and are left to polling. Exits with 1 if any check fails.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_bridge import (  # noqa: E402
+    FakeBridge,
+    make_sensors,
+    start_in_thread,
+    v2_buttons,
+)
+from custom_components.huesensor.event_stream import (  # noqa: E402
+    HueEventStream,
+    apply_resource,
+    sensor_id,
+)
+
+MIX = {"SML": 1, "RWL": 1, "ROM": 1, "ZGP": 1, "FOH": 1}
+
+
+def events(sensors):
+    """Return one (sensor id, state) event of each kind for the fleet."""
+    by_type = {}
+    for raw_id, raw in sensors.items():
+        by_type.setdefault((raw["type"], raw["modelid"][0:3]), raw_id)
+    return [
+        (by_type["ZLLPresence", "SML"], {"presence": True}),
+        (by_type["ZLLTemperature", "SML"], {"temperature": 2345}),
+        (by_type["ZLLLightLevel", "SML"], {"lightlevel": 20000}),
+        (by_type["ZLLSwitch", "RWL"], {"buttonevent": 4002}),
+        (by_type["ZLLSwitch", "ROM"], {"buttonevent": 1003}),
+        (by_type["ZGPSwitch", "ZGP"], {"buttonevent": 17}),
+        (by_type["ZGPSwitch", "FOH"], {"buttonevent": 20}),
+    ]
+
+
+async def run(args):
+    sensors = make_sensors(len(MIX), MIX)
+    # What the client knows from its last poll, before the events.
+    polled = {raw_id: dict(raw) for raw_id, raw in sensors.items()}
+    bridge = FakeBridge(sensors)
+    address = start_in_thread(bridge)
+    pushed = asyncio.Queue()
+    connected = asyncio.Event()
+    failures = []
+
+    def check(name, ok):
+        print("{:<48} {}".format(name, "ok" if ok else "FAILED"))
+        if not ok:
+            failures.append(name)
+
+    async with aiohttp.ClientSession() as session:
+        stream = HueEventStream(
+            session,
+            "http://" + address,
+            "check",
+            lambda resource, updated: pushed.put_nowait((resource, updated)),
+            lambda is_connected: is_connected and connected.set(),
+        )
+        stream.start(asyncio.get_event_loop())
+        try:
+            await asyncio.wait_for(connected.wait(), args.timeout)
+            check("connected", stream.connected)
+            check(
+                "button control ids",
+                len(stream.control_ids) == len(v2_buttons(sensors)),
+            )
+            for raw_id, state in events(sensors):
+                raw = polled[raw_id]
+                name = "{} {}".format(raw["modelid"], state)
+                bridge.loop.call_soon_threadsafe(bridge.apply_event, raw_id, state)
+                resource, updated = await asyncio.wait_for(pushed.get(), args.timeout)
+                patched = apply_resource(raw, resource, updated, stream.control_ids)
+                check(name + " id_v1", sensor_id(resource) == raw_id)
+                if raw["modelid"][0:3] in ("RWL", "ROM", "SML"):
+                    check(
+                        name,
+                        patched is not None
+                        and all(patched["state"][key] == state[key] for key in state)
+                        and patched["state"]["lastupdated"] == updated,
+                    )
+                else:
+                    check(name + " left to polling", patched is None)
+        except asyncio.TimeoutError:
+            check("pushed within {}s".format(args.timeout), False)
+        finally:
+            stream.stop()
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--timeout", type=float, default=5, help="seconds to wait for each push"
+    )
+    args = parser.parse_args(argv)
+    return asyncio.get_event_loop().run_until_complete(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Load the bridge dumps in debugging_issues and scale them to fleet sizes."""
+import copy
+import glob
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUMPS = sorted(glob.glob(os.path.join(ROOT, "debugging_issues", "*", "*.json")))
+
+
+def load_dumps(paths=DUMPS):
+    """Return the raw sensors of all dumps as one list."""
+    sensors = []
+    for path in paths:
+        with open(path) as dump:
+            sensors.extend(json.load(dump).values())
+    return sensors
+
+
+def _copy_sensor(sensor, copy_index):
+    """Return a deep copy of a sensor with a uniqueid distinct per copy."""
+    sensor = copy.deepcopy(sensor)
+    uniqueid = sensor.get("uniqueid")
+    if uniqueid and copy_index:
+        # Rewrite two bytes of the MAC, the endpoint part stays the same.
+        sensor["uniqueid"] = "{}:{:02x}:{:02x}{}".format(
+            uniqueid[:8], copy_index // 256, copy_index % 256, uniqueid[14:]
+        )
+    return sensor
+
+
+def scale_sensors(sensors, count):
+    """Return count raw sensors, repeating the given ones as new devices."""
+    scaled = []
+    copy_index = 0
+    while len(scaled) < count:
+        scaled.extend(_copy_sensor(sensor, copy_index) for sensor in sensors)
+        copy_index += 1
+    return scaled[:count]
+
+
+def as_response(sensors):
+    """Return a list of raw sensors as a /sensors response keyed by id."""
+    return {str(sensor_id): sensor for sensor_id, sensor in enumerate(sensors, 1)}
+
+
+def touch(sensor, tick):
+    """Change a raw sensor the way the bridge would on an event."""
+    state = sensor["state"]
+    state["lastupdated"] = "2019-01-01T{:02d}:{:02d}:{:02d}".format(
+        tick // 3600 % 24, tick // 60 % 60, tick % 60
+    )
+    if "presence" in state:
+        state["presence"] = not state["presence"]
+    elif "buttonevent" in state:
+        state["buttonevent"] = 1002 if state["buttonevent"] != 1002 else 4002
+    elif "temperature" in state:
+        state["temperature"] = 2000 + tick % 100
+    elif "lightlevel" in state:
+        state["lightlevel"] = 10000 + tick % 1000
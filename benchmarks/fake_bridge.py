@@ -0,0 +1,506 @@
+"""A fake Hue bridge serving the v1 API for load testing.
+
+    python benchmarks/fake_bridge.py --port 8080 --sensors 50 --events-per-sec 2
+
+It serves /api/<username> and /api/<username>/sensors[/<id>] the way
+aiohue reads them, with a configurable fleet, scripted or random button
+and motion events, injected latency, timeouts and Hue error responses.
+Any username is accepted. The events are pushed on a stand-in of the v2
+event stream too, /eventstream/clip/v2 with the buttons it refers to at
+/clip/v2/resource/button, served over plain http.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+DEFAULT_MIX = {"SML": 3, "RWL": 2, "ROM": 1, "ZGP": 1, "FOH": 1, "Geofence": 1}
+MODEL_BYTES = {"SML": 1, "RWL": 2, "ROM": 3, "ZGP": 4, "FOH": 5, "Geofence": 6}
+RWL_EVENTS = (1000, 1002, 2000, 2002, 3000, 3002, 4000, 4002, 1001, 1003)
+TAP_EVENTS = (34, 16, 17, 18)
+FOH_EVENTS = (16, 20, 17, 21, 18, 22, 19, 23)
+# v2 last_event of the last three digits of a v1 buttonevent of a dimmer switch.
+V2_BUTTON_EVENTS = {
+    0: "initial_press",
+    1: "repeat",
+    2: "short_release",
+    3: "long_release",
+}
+# Buttons of a device in the v2 API, with their control ids.
+V2_BUTTONS = {"RWL": 4, "ROM": 1, "ZGP": 4, "FOH": 4}
+# Seconds a request hangs when a timeout is injected, past the client timeout.
+HANG = 30
+ERROR = [
+    {"error": {"type": 901, "address": "/sensors", "description": "Internal error"}}
+]
+
+
+def now_lastupdated():
+    """Return the current UTC time in the format of lastupdated."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+
+
+def make_device(model, index):
+    """Return the raw resources of one device of a model."""
+    high, middle, low = index // 65536 % 256, index // 256 % 256, index % 256
+    mac = "00:17:88:{:02x}:{:02x}:{:02x}:{:02x}:01".format(
+        MODEL_BYTES[model], high, middle, low
+    )
+    lastupdated = now_lastupdated()
+    common = {"manufacturername": "Philips", "swversion": "6.1.1.28573"}
+    config = {"on": True, "battery": 100, "reachable": True, "pending": []}
+
+    if model == "SML":
+        name = "Room {} sensor".format(index)
+        return [
+            dict(
+                common,
+                name=name,
+                type="ZLLPresence",
+                modelid="SML001",
+                uniqueid=mac + "-02-0406",
+                state={"presence": False, "lastupdated": lastupdated},
+                config=dict(config, sensitivity=2, sensitivitymax=2),
+            ),
+            dict(
+                common,
+                name="Hue ambient light sensor {}".format(index),
+                type="ZLLLightLevel",
+                modelid="SML001",
+                uniqueid=mac + "-02-0400",
+                state={
+                    "lightlevel": 12000,
+                    "dark": False,
+                    "daylight": False,
+                    "lastupdated": lastupdated,
+                },
+                config=dict(config, tholddark=16000, tholdoffset=7000),
+            ),
+            dict(
+                common,
+                name="Hue temperature sensor {}".format(index),
+                type="ZLLTemperature",
+                modelid="SML001",
+                uniqueid=mac + "-02-0402",
+                state={"temperature": 2100, "lastupdated": lastupdated},
+                config=dict(config),
+            ),
+        ]
+    if model in ("RWL", "ROM"):
+        return [
+            dict(
+                common,
+                name="{} switch {}".format(model, index),
+                type="ZLLSwitch",
+                modelid="RWL021" if model == "RWL" else "ROM001",
+                uniqueid=mac + "-02-fc00",
+                state={"buttonevent": 1002, "lastupdated": lastupdated},
+                config=dict(config),
+            )
+        ]
+    if model in ("ZGP", "FOH"):
+        if model == "ZGP":
+            uniqueid = "00:00:00:00:{:02x}:{:02x}:{:02x}:01-f2".format(
+                high, middle, low
+            )
+        else:
+            # FOH records are keyed on the last five characters of the uniqueid.
+            uniqueid = "00:00:00:00:01:{:02x}:{:02x}:{:02x}-{:02x}".format(
+                MODEL_BYTES[model], high, middle, low
+            )
+        return [
+            dict(
+                common,
+                name="{} switch {}".format(model, index),
+                type="ZGPSwitch",
+                modelid="ZGPSWITCH" if model == "ZGP" else "FOHSWITCH",
+                uniqueid=uniqueid,
+                state={"buttonevent": 16, "lastupdated": lastupdated},
+                config={"on": True},
+            )
+        ]
+    if model == "Geofence":
+        return [
+            {
+                "name": "Phone {}".format(index),
+                "type": "Geofence",
+                "modelid": "HA_GEOFENCE",
+                "manufacturername": "Philips",
+                "swversion": "A_1",
+                "uniqueid": "L_02_{:05x}".format(index),
+                "state": {"presence": True, "lastupdated": lastupdated},
+                "config": {"on": True, "reachable": True},
+            }
+        ]
+    raise ValueError("Unknown model {}".format(model))
+
+
+def button_id(sensor_id, control_id):
+    """Return the v2 id of a button of the v1 sensor with sensor_id."""
+    return "button-{}-{}".format(sensor_id, control_id)
+
+
+def v2_buttons(sensors):
+    """Return the v2 button resources of a /sensors response."""
+    buttons = []
+    for sensor_id, raw in sensors.items():
+        for control_id in range(1, V2_BUTTONS.get(raw["modelid"][0:3], 0) + 1):
+            buttons.append(
+                {
+                    "id": button_id(sensor_id, control_id),
+                    "id_v1": "/sensors/" + sensor_id,
+                    "type": "button",
+                    "metadata": {"control_id": control_id},
+                }
+            )
+    return buttons
+
+
+def v2_resources(sensor_id, raw, state):
+    """Return the v2 resources pushed for a change of state of a v1 sensor."""
+    resources = []
+    common = {"id_v1": "/sensors/" + sensor_id}
+    if "presence" in state and raw["type"] == "ZLLPresence":
+        resources.append(
+            dict(
+                common,
+                id="motion-" + sensor_id,
+                type="motion",
+                motion={"motion": state["presence"]},
+            )
+        )
+    if "temperature" in state:
+        resources.append(
+            dict(
+                common,
+                id="temperature-" + sensor_id,
+                type="temperature",
+                temperature={"temperature": state["temperature"] / 100},
+            )
+        )
+    if "lightlevel" in state:
+        resources.append(
+            dict(
+                common,
+                id="light_level-" + sensor_id,
+                type="light_level",
+                light={"light_level": state["lightlevel"]},
+            )
+        )
+    if "buttonevent" in state and raw["modelid"][0:3] in V2_BUTTONS:
+        # Only the dimmer switch codes translate; for the others the v2
+        # event is pushed but can't be mapped back, as on a real bridge.
+        control_id, code = divmod(state["buttonevent"], 1000)
+        if raw["modelid"][0:3] not in ("RWL", "ROM"):
+            control_id, code = 1, 0
+        resources.append(
+            dict(
+                common,
+                id=button_id(sensor_id, control_id),
+                type="button",
+                button={"last_event": V2_BUTTON_EVENTS.get(code)},
+            )
+        )
+    return resources
+
+
+def make_sensors(count, mix=DEFAULT_MIX):
+    """Return a /sensors response of count devices spread over the mix."""
+    models = list(
+        itertools.islice(
+            itertools.cycle(
+                [model for model, weight in mix.items() for _ in range(weight)]
+            ),
+            count,
+        )
+    )
+    sensors = {
+        "1": {
+            "name": "Daylight",
+            "type": "Daylight",
+            "modelid": "PHDL00",
+            "manufacturername": "Philips",
+            "swversion": "1.0",
+            "state": {"daylight": True, "lastupdated": now_lastupdated()},
+            "config": {"on": True, "configured": True},
+        }
+    }
+    for index, model in enumerate(models):
+        for raw in make_device(model, index):
+            sensors[str(len(sensors) + 1)] = raw
+    return sensors
+
+
+class FakeBridge(object):
+    """State and misbehaviour of the fake bridge."""
+
+    def __init__(
+        self,
+        sensors,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        timeout_rate=0.0,
+        seed=None,
+    ):
+        """Initialize the bridge with a /sensors response."""
+        self.sensors = sensors
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.on_event = None
+        # Queues of the v2 event streams connected.
+        self.streams = []
+        self.event_ids = itertools.count()
+        self.loop = None
+
+    def make_app(self):
+        """Return the aiohttp application serving the API."""
+        app = web.Application()
+        app.router.add_get("/api/{username}", self.handle_full_state)
+        app.router.add_get("/api/{username}/", self.handle_full_state)
+        app.router.add_get("/api/{username}/sensors", self.handle_sensors)
+        app.router.add_get("/api/{username}/sensors/{sensor_id}", self.handle_sensor)
+        app.router.add_get("/api/{username}/config", self.handle_config)
+        app.router.add_get("/clip/v2/resource/button", self.handle_v2_buttons)
+        app.router.add_get("/eventstream/clip/v2", self.handle_event_stream)
+        return app
+
+    def _respond(self, data):
+        """Return a JSON response, counting its bytes."""
+        response = web.json_response(data)
+        self.bytes_sent += len(response.body)
+        return response
+
+    async def _misbehave(self):
+        """Apply the injected latency and failures, return an error or None."""
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        draw = self.random.random()
+        if draw < self.timeout_rate:
+            self.timeouts += 1
+            await asyncio.sleep(HANG)
+        elif draw < self.timeout_rate + self.error_rate:
+            self.errors += 1
+            return self._respond(ERROR)
+        return None
+
+    def _config(self):
+        """Return the bridge config."""
+        return {
+            "name": "Fake bridge",
+            "bridgeid": "001788FFFE000000",
+            "apiversion": "1.35.0",
+        }
+
+    async def handle_full_state(self, request):
+        error = await self._misbehave()
+        if error is not None:
+            return error
+        return self._respond(
+            {
+                "config": self._config(),
+                "lights": {},
+                "groups": {},
+                "scenes": {},
+                "rules": {},
+                "schedules": {},
+                "resourcelinks": {},
+                "sensors": self.sensors,
+            }
+        )
+
+    async def handle_config(self, request):
+        return self._respond(self._config())
+
+    async def handle_sensors(self, request):
+        error = await self._misbehave()
+        if error is not None:
+            return error
+        return self._respond(self.sensors)
+
+    async def handle_sensor(self, request):
+        error = await self._misbehave()
+        if error is not None:
+            return error
+        sensor = self.sensors.get(request.match_info["sensor_id"])
+        if sensor is None:
+            return self._respond(ERROR)
+        return self._respond(sensor)
+
+    async def handle_v2_buttons(self, request):
+        error = await self._misbehave()
+        if error is not None:
+            return error
+        return self._respond({"errors": [], "data": v2_buttons(self.sensors)})
+
+    async def handle_event_stream(self, request):
+        """Push the events as server-sent events until the client leaves."""
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        queue = asyncio.Queue()
+        self.streams.append(queue)
+        try:
+            while True:
+                chunk = (await queue.get()).encode("utf-8")
+                self.bytes_sent += len(chunk)
+                await response.write(chunk)
+        finally:
+            self.streams.remove(queue)
+
+    def push_event(self, sensor_id, raw, state):
+        """Push the v2 resources of a change to the connected event streams."""
+        resources = v2_resources(sensor_id, raw, state)
+        if not resources or not self.streams:
+            return
+        event = {
+            "creationtime": raw["state"]["lastupdated"] + "Z",
+            "data": resources,
+            "id": "event-{}".format(next(self.event_ids)),
+            "type": "update",
+        }
+        chunk = "id: {}:0\ndata: {}\n\n".format(int(time.time()), json.dumps([event]))
+        for queue in self.streams:
+            queue.put_nowait(chunk)
+
+    def apply_event(self, sensor_id, state):
+        """Change the state of a sensor as the bridge does on an event."""
+        raw = self.sensors[sensor_id]
+        raw["state"] = dict(raw["state"], lastupdated=now_lastupdated(), **state)
+        self.push_event(sensor_id, raw, state)
+        if self.on_event is not None:
+            self.on_event(raw)
+
+    def random_event(self):
+        """Press a random button or toggle a random motion sensor."""
+        candidates = [
+            (sensor_id, raw)
+            for sensor_id, raw in self.sensors.items()
+            if raw["type"] in ("ZLLPresence", "ZLLSwitch", "ZGPSwitch")
+        ]
+        if not candidates:
+            return
+        sensor_id, raw = self.random.choice(candidates)
+        if raw["type"] == "ZLLPresence":
+            state = {"presence": not raw["state"]["presence"]}
+        elif raw["modelid"].startswith("FOH"):
+            state = {"buttonevent": self.random.choice(FOH_EVENTS)}
+        elif raw["type"] == "ZGPSwitch":
+            state = {"buttonevent": self.random.choice(TAP_EVENTS)}
+        else:
+            state = {"buttonevent": self.random.choice(RWL_EVENTS)}
+        self.apply_event(sensor_id, state)
+
+    async def run_events(self, events_per_sec=0.0, script=()):
+        """Play scripted events, then random ones at the given rate.
+
+        A script is a list of {"at": seconds, "sensor": id, "state": {...}}.
+        """
+        started = time.monotonic()
+        for event in sorted(script, key=lambda event: event["at"]):
+            await asyncio.sleep(max(0, started + event["at"] - time.monotonic()))
+            self.apply_event(event["sensor"], event["state"])
+        while events_per_sec:
+            await asyncio.sleep(self.random.expovariate(events_per_sec))
+            self.random_event()
+
+
+def start_in_thread(bridge, host="127.0.0.1", port=0, events_per_sec=0.0, script=()):
+    """Serve the bridge from its own thread and event loop.
+
+    Keeping the bridge off the loop under test keeps its work out of the
+    measurements. Return the host:port it listens on.
+    """
+    ready = threading.Event()
+    address = []
+
+    def serve():
+        loop = bridge.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(bridge.make_app())
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        address.append("{}:{}".format(*runner.addresses[0][:2]))
+        ready.set()
+        loop.run_until_complete(bridge.run_events(events_per_sec, script))
+        loop.run_forever()
+
+    threading.Thread(target=serve, name="fake-hue-bridge", daemon=True).start()
+    ready.wait()
+    return address[0]
+
+
+def parse_mix(value):
+    """Parse a model mix like SML=3,RWL=2."""
+    mix = {}
+    for part in value.split(","):
+        model, _, weight = part.partition("=")
+        mix[model] = int(weight or 1)
+    return mix
+
+
+def add_arguments(parser):
+    """Add the options shaping the fake bridge to an argument parser."""
+    parser.add_argument("--sensors", type=int, default=20, help="number of devices")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--events-per-sec", type=float, default=1.0)
+    parser.add_argument("--script", help="json file of scripted events")
+    parser.add_argument("--seed", type=int)
+
+
+def bridge_from_args(args):
+    """Create a FakeBridge and its event script from parsed arguments."""
+    bridge = FakeBridge(
+        make_sensors(args.sensors, args.mix),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        seed=args.seed,
+    )
+    script = ()
+    if args.script:
+        with open(args.script) as script_file:
+            script = json.load(script_file)
+    return bridge, script
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    bridge, script = bridge_from_args(args)
+    address = start_in_thread(bridge, args.host, args.port, args.events_per_sec, script)
+    print("Fake bridge with {} resources on {}".format(len(bridge.sensors), address))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
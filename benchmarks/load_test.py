@@ -0,0 +1,238 @@
+"""Drive HueSensorData end to end against the fake bridge.
+
+    python benchmarks/load_test.py --sensors 100 --duration 30 --latency 0.02
+
+The fake bridge runs in its own thread. Ticks are fired every --tick
+seconds like async_track_time_interval does, through update_api and
+HueSensorData.async_update_info. Reported are ticks and requests per
+second, bytes served per tick, event loop CPU time per tick, and the time
+from an event on the bridge to the state write of its entity. --tiered
+compares against tiered polling, --raw-client against the slim /sensors
+client. --capture records the polls for benchmarks/replay.py. --busy-ms
+blocks the loop on every tick, like an overloaded Home Assistant, to
+see the load shedding at work.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+
+import aiohttp
+import aiohue
+from homeassistant.components.hue.bridge import HueBridge
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_bridge import (  # noqa: E402
+    add_arguments,
+    bridge_from_args,
+    start_in_thread,
+)
+from benchmarks.stand_in import StandInHass  # noqa: E402
+from custom_components.huesensor.const import (  # noqa: E402
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_RAW_CLIENT,
+    CONF_REQUEST_SHARE,
+    CONF_TIERED_POLLING,
+)
+from custom_components.huesensor.capture import write_records  # noqa: E402
+from custom_components.huesensor.data_manager import HueSensorData  # noqa: E402
+from custom_components.huesensor.hue_api_response import sensor_key  # noqa: E402
+from custom_components.huesensor.raw_client import RawSensorsClient  # noqa: E402
+
+USERNAME = "loadtest"
+MODELS = ("RWL", "ZGP", "FOH", "SML")
+
+
+class LoadTestBridge(HueBridge):
+    """A hue bridge entry wrapping an aiohue bridge pointed at the fake."""
+
+    def __init__(self, host, api):
+        """Initialize without a config entry."""
+        self._host = host
+        self.api = api
+
+    @property
+    def host(self):
+        return self._host
+
+
+class ProbeEntity(object):
+    """Entity stand-in reporting its state writes to the probe."""
+
+    def __init__(self, probe, key):
+        """Initialize the entity."""
+        self.probe = probe
+        self.key = key
+
+    def async_record_updated(self):
+        self.probe.written(self.key)
+
+
+class LatencyProbe(object):
+    """Measure the time from an event on the bridge to its state write.
+
+    Only the first event of a sensor is timed until its state is written.
+    """
+
+    def __init__(self):
+        """Initialize the probe."""
+        self.pending = {}
+        self.latencies = []
+        self.writes = 0
+
+    def on_event(self, raw):
+        """Note an event applied by the bridge, called from its thread."""
+        key = sensor_key(raw)
+        if key is not None:
+            self.pending.setdefault(key, time.monotonic())
+
+    def entity(self, key, data):
+        return ProbeEntity(self, key)
+
+    def add_entities(self, entities, update_before_add=False):
+        pass
+
+    def written(self, key):
+        """Note a state write of the entity of key."""
+        self.writes += 1
+        event_time = self.pending.pop(key, None)
+        if event_time is not None:
+            self.latencies.append(time.monotonic() - event_time)
+
+
+def percentile(values, fraction):
+    """Return the value at a fraction of the sorted values."""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def drive(data, duration, tick):
+    """Fire ticks for duration seconds, return the count and CPU used."""
+    loop = asyncio.get_event_loop()
+    tasks = set()
+    ticks = 0
+    cpu = time.thread_time()
+    deadline = next_tick = loop.time()
+    deadline += duration
+    while loop.time() < deadline:
+        task = loop.create_task(data.async_update_info(now=True))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        ticks += 1
+        next_tick += tick
+        await asyncio.sleep(max(0, next_tick - loop.time()))
+    cpu = time.thread_time() - cpu
+    for task in tasks:
+        task.cancel()
+    return ticks, cpu
+
+
+async def block_loop(milliseconds, tick):
+    """Block the event loop for some milliseconds on every tick."""
+    while True:
+        time.sleep(milliseconds / 1000)
+        await asyncio.sleep(tick)
+
+
+async def run(args):
+    fake, script = bridge_from_args(args)
+    probe = LatencyProbe()
+    fake.on_event = probe.on_event
+    address = start_in_thread(fake, events_per_sec=args.events_per_sec, script=script)
+    loop = asyncio.get_event_loop()
+
+    async with aiohttp.ClientSession() as session:
+        api = aiohue.Bridge(address, session, username=USERNAME)
+        await api.initialize()
+        hass = StandInHass(loop)
+        hass.data["hue"] = {"load_test": LoadTestBridge(address, api)}
+        data = HueSensorData(hass)
+        config = {}
+        if args.min_scan_interval is not None:
+            config[CONF_MIN_SCAN_INTERVAL] = args.min_scan_interval
+        if args.max_scan_interval is not None:
+            config[CONF_MAX_SCAN_INTERVAL] = args.max_scan_interval
+        config[CONF_TIERED_POLLING] = args.tiered
+        config[CONF_RAW_CLIENT] = args.raw_client
+        if args.request_share is not None:
+            config[CONF_REQUEST_SHARE] = args.request_share
+        data.async_configure(config)
+        # Home Assistant's shared session isn't there, use the one at hand.
+        data.raw_clients[address] = RawSensorsClient(session, address, USERNAME)
+        data.async_add_platform(MODELS, probe.entity, probe.add_entities)
+
+        data.async_watch_loop_lag()
+        if args.busy_ms:
+            busy = loop.create_task(block_loop(args.busy_ms, args.tick))
+        if args.capture:
+            data.capture = []
+        requests, bytes_sent = fake.requests, fake.bytes_sent
+        ticks, cpu = await drive(data, args.duration, args.tick)
+        if args.busy_ms:
+            busy.cancel()
+        data.lag_monitor.stop()
+        requests = fake.requests - requests
+        bytes_sent = fake.bytes_sent - bytes_sent
+
+    if args.capture:
+        write_records(args.capture, data.capture)
+        print("captured           {} polls".format(len(data.capture)))
+    print("resources          {}".format(len(fake.sensors)))
+    print("ticks/s            {:.1f}".format(ticks / args.duration))
+    print("requests/s         {:.1f}".format(requests / args.duration))
+    print("bytes/tick         {:.0f}".format(bytes_sent / max(ticks, 1)))
+    print("loop CPU/tick      {:.3f} ms".format(1000 * cpu / max(ticks, 1)))
+    print("loop CPU/request   {:.3f} ms".format(1000 * cpu / max(requests, 1)))
+    print("state writes       {}".format(probe.writes))
+    print("events timed       {}".format(len(probe.latencies)))
+    for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1)):
+        print(
+            "event->state {}   {:.1f} ms".format(
+                label, 1000 * percentile(probe.latencies, fraction)
+            )
+        )
+    print(
+        "loop lag           {:.0f} ms{}".format(
+            1000 * data.lag_monitor.lag, ", shedding" if data.shedding else ""
+        )
+    )
+    print("writes held back   {}".format(len(data.deferred_writes)))
+    print("bridge errors      {}".format(fake.errors))
+    print("bridge timeouts    {}".format(fake.timeouts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--tick", type=float, default=0.1)
+    parser.add_argument("--tiered", action="store_true", help="use tiered polling")
+    parser.add_argument(
+        "--raw-client", action="store_true", help="use the slim /sensors client"
+    )
+    parser.add_argument(
+        "--request-share", type=float, help="share of the bridge request budget"
+    )
+    parser.add_argument("--capture", help="capture the polls to this .jsonl.gz")
+    parser.add_argument(
+        "--busy-ms", type=float, default=0, help="block the loop on every tick"
+    )
+    parser.add_argument(
+        "--min-scan-interval", type=lambda value: timedelta(seconds=float(value))
+    )
+    parser.add_argument(
+        "--max-scan-interval", type=lambda value: timedelta(seconds=float(value))
+    )
+    args = parser.parse_args(argv)
+    asyncio.get_event_loop().run_until_complete(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Replay a capture of bridge polls through HueSensorData.
+
+    python benchmarks/replay.py huesensor_capture_20200101120000.jsonl.gz
+    python benchmarks/replay.py capture.jsonl.gz --speed 1
+
+Captures are recorded with the huesensor.capture service, or with
+load_test.py --capture. Each captured poll is fed through
+HueSensorData.update_bridge, as fast as possible or, with --speed, at the
+captured pace sped up by that factor. Reported are the polls per second,
+the state writes flushed, the button events and gestures fired, and the
+time spent in each polling phase. Run it on two versions to compare them
+on the same traffic.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stand_in import CountingEntity, StandInHass  # noqa: E402
+from custom_components.huesensor.capture import read_records  # noqa: E402
+from custom_components.huesensor.const import (  # noqa: E402
+    EVENT_BUTTON,
+    EVENT_GESTURE,
+)
+from custom_components.huesensor.data_manager import HueSensorData  # noqa: E402
+from custom_components.huesensor.governor import RequestGovernor  # noqa: E402
+from custom_components.huesensor.profiler import PhaseTimer  # noqa: E402
+
+MODELS = ("RWL", "ZGP", "FOH", "SML")
+# Requests per second let through, so the replay isn't held to a bridge's pace.
+UNLIMITED = 1e9
+
+
+class ReplayBridge(object):
+    """A hue bridge entry standing in for a captured one."""
+
+    def __init__(self, host):
+        """Initialize the bridge."""
+        self.host = host
+        self.api = None
+
+
+class ReplayClient(object):
+    """/sensors client answering with the captured poll at hand."""
+
+    def __init__(self):
+        """Initialize without a poll."""
+        self.sensors = {}
+
+    async def fetch(self):
+        return self.sensors
+
+
+class ReplayClock(object):
+    """Clock standing at the captured time of the poll at hand.
+
+    Presses and measurements are timed as they were captured, so double
+    clicks, sequences and minimum intervals come out as they did live,
+    at any speed.
+    """
+
+    def __init__(self):
+        """Initialize at time 0."""
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay_data(loop):
+    """Return a HueSensorData fetching through replay clients."""
+    data = HueSensorData(StandInHass(loop))
+    data.raw_client = True
+    data.clock = ReplayClock()
+    data.phases = PhaseTimer()
+    data.async_add_platform(
+        MODELS, CountingEntity, lambda entities, update_before_add=False: None
+    )
+    return data
+
+
+async def replay(data, records, speed):
+    """Feed the captured polls to data, return their count."""
+    loop = asyncio.get_event_loop()
+    bridges = {}
+    first = started = None
+    polls = 0
+    for record in records:
+        host = record["host"]
+        if speed:
+            if first is None:
+                first, started = record["time"], loop.time()
+            delay = (record["time"] - first) / speed - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        bridge = bridges.get(host)
+        if bridge is None:
+            bridge = bridges[host] = ReplayBridge(host)
+            data.raw_clients[host] = ReplayClient()
+            data.governors[host] = RequestGovernor(UNLIMITED)
+        data.raw_clients[host].sensors = record["sensors"]
+        data.clock.now = record["time"]
+        await data.update_bridge(bridge)
+        polls += 1
+    return polls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="capture file, .jsonl.gz")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="factor to speed up the captured pace by, 0 for as fast as possible",
+    )
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    data = replay_data(loop)
+    started = time.perf_counter()
+    polls = loop.run_until_complete(
+        replay(data, read_records(args.capture), args.speed)
+    )
+    elapsed = time.perf_counter() - started
+    events = [event_type for event_type, _ in data.hass.bus.events]
+
+    print("polls              {}".format(polls))
+    print("sensors            {}".format(len(data.data)))
+    print("elapsed            {:.2f} s".format(elapsed))
+    print("polls/s            {:.1f}".format(polls / elapsed if elapsed else 0))
+    print("state writes       {}".format(CountingEntity.writes))
+    print("button events      {}".format(events.count(EVENT_BUTTON)))
+    print("gestures           {}".format(events.count(EVENT_GESTURE)))
+    print()
+    print("\n".join(data.phases.report()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Stand-ins for the parts of Home Assistant that HueSensorData uses."""
+
+
+class StandInBus(object):
+    """Event bus recording what is fired."""
+
+    def __init__(self):
+        """Initialize the bus."""
+        self.events = []
+
+    def async_fire(self, event_type, event_data=None):
+        self.events.append((event_type, event_data))
+
+    def async_listen_once(self, event_type, listener):
+        return lambda: None
+
+
+class StandInHass(object):
+    """Home Assistant reduced to its loop, data and event bus."""
+
+    def __init__(self, loop=None):
+        """Initialize with the loop under test, if any."""
+        self.loop = loop
+        self.data = {}
+        self.bus = StandInBus()
+
+    def async_create_task(self, target):
+        return self.loop.create_task(target)
+
+
+class CountingEntity(object):
+    """Entity counting its state writes."""
+
+    writes = 0
+
+    def __init__(self, key, data):
+        """Initialize the entity."""
+        self.key = key
+
+    def async_record_updated(self):
+        CountingEntity.writes += 1
+
+    async def async_remove(self):
+        pass
@@ -4,212 +4,33 @@ Sensor for checking the status of Hue sensors.
 For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/sensor.hue/
 """
-import asyncio
-import async_timeout
 import logging
-import threading
-from datetime import timedelta
 
 from homeassistant.components.sensor import PLATFORM_SCHEMA
-from homeassistant.const import STATE_ON, STATE_OFF
+from homeassistant.const import STATE_ON
 from homeassistant.components.binary_sensor import BinarySensorDevice
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import callback
+
+from .const import POLLING_SCHEMA
+from .data_manager import get_sensor_data
 
 DEPENDENCIES = ["hue"]
 
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=0.1)
-TYPE_GEOFENCE = "Geofence"
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(POLLING_SCHEMA)
+
 ICONS = {"SML": "mdi:run", "RWL": "mdi:remote", "ZGP": "mdi:remote"}
 DEVICE_CLASSES = {"SML": "motion"}
-ATTRS = {
-    "SML": [
-        "light_level",
-        "battery",
-        "last_updated",
-        "lx",
-        "dark",
-        "daylight",
-        "temperature",
-        "on",
-        "reachable",
-        "sensitivity",
-        "threshold",
-    ],
-    "RWL": ["last_updated", "battery", "on", "reachable"],
-    "ZGP": ["last_updated"],
-}
-
-
-def parse_hue_api_response(sensors):
-    """Take in the Hue API json response."""
-    data_dict = {}  # The list of sensors, referenced by their hue_id.
-
-    # Loop over all keys (1,2 etc) to identify sensors and get data.
-    for sensor in sensors:
-        modelid = sensor["modelid"][0:3]
-        if modelid in ["RWL", "SML", "ZGP"]:
-            _key = modelid + "_" + sensor["uniqueid"][:-5]
-            if modelid == "SML":
-                if _key not in data_dict:
-                    data_dict[_key] = parse_sml(sensor)
-                else:
-                    data_dict[_key].update(parse_sml(sensor))
-
-    return data_dict
-
-
-def parse_sml(response):
-    """Parse the json for a SML Hue motion sensor and return the data."""
-    if response["type"] == "ZLLLightLevel":
-        lightlevel = response["state"].get("lightlevel")
-        tholddark = response["config"].get("tholddark")
-        if lightlevel is not None:
-            lx = round(float(10 ** ((lightlevel - 1) / 10000)), 2)
-            dark = response["state"]["dark"]
-            daylight = response["state"]["daylight"]
-            data = {
-                "light_level": lightlevel,
-                "lx": lx,
-                "dark": dark,
-                "daylight": daylight,
-                "threshold": tholddark,
-            }
-        else:
-            data = {
-                "light_level": "No light level data",
-                "lx": None,
-                "dark": None,
-                "daylight": None,
-                "threshold": tholddark,
-            }
-
-    elif response["type"] == "ZLLTemperature":
-        if response["state"]["temperature"] is not None:
-            data = {"temperature": response["state"]["temperature"] / 100.0}
-        else:
-            data = {"temperature": "No temperature data"}
-
-    elif response["type"] == "ZLLPresence":
-        name_raw = response["name"]
-        arr = name_raw.split()
-        arr.insert(-1, "motion")
-        name = " ".join(arr)
-        hue_state = response["state"]["presence"]
-        if hue_state is True:
-            state = STATE_ON
-        else:
-            state = STATE_OFF
-
-        data = {
-            "model": "SML",
-            "name": name,
-            "state": state,
-            "battery": response["config"]["battery"],
-            "on": response["config"]["on"],
-            "reachable": response["config"]["reachable"],
-            "sensitivity": response["config"]["sensitivity"],
-            "last_updated": response["state"]["lastupdated"].split("T"),
-        }
-    return data
-
-
-def get_bridges(hass):
-    from homeassistant.components import hue
-    from homeassistant.components.hue.bridge import HueBridge
-
-    return [
-        entry
-        for entry in hass.data[hue.DOMAIN].values()
-        if isinstance(entry, HueBridge) and entry.api
-    ]
-
-
-async def update_api(api):
-    import aiohue
-
-    try:
-        with async_timeout.timeout(10):
-            await api.update()
-    except (asyncio.TimeoutError, aiohue.AiohueException) as err:
-        _LOGGER.debug("Failed to fetch sensors: %s", err)
-        return False
-    return True
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Initialise Hue Bridge connection."""
-    data = HueSensorData(hass, async_add_entities)
-    await data.async_update_info()
-    async_track_time_interval(hass, data.async_update_info, SCAN_INTERVAL)
-
-
-class HueSensorData(object):
-    """Get the latest sensor data."""
-
-    def __init__(self, hass, async_add_entities):
-        """Initialize the data object."""
-        self.hass = hass
-        self.lock = threading.Lock()
-        self.data = {}
-        self.sensors = {}
-        self.async_add_entities = async_add_entities
-
-    async def update_bridge(self, bridge):
-        available = await update_api(bridge.api.sensors)
-        if not available:
-            return
-
-        data = parse_hue_api_response(
-            sensor.raw
-            for sensor in bridge.api.sensors.values()
-            if sensor.type != TYPE_GEOFENCE
-        )
-
-        new_sensors = data.keys() - self.data.keys()
-        updated_sensors = []
-        for key, new in data.items():
-            new["changed"] = True
-            old = self.data.get(key)
-            if not old or old == new:
-                continue
-            updated_sensors.append(key)
-            if (
-                old["last_updated"] == new["last_updated"]
-                and old["state"] == new["state"]
-            ):
-                new["changed"] = False
-        self.data.update(data)
-
-        new_entities = {
-            entity_id: HueSensor(entity_id, self) for entity_id in new_sensors
-        }
-        if new_entities:
-            _LOGGER.debug("Created %s", ", ".join(new_entities.keys()))
-            self.sensors.update(new_entities)
-            self.async_add_entities(new_entities.values(), True)
-        for entity_id in updated_sensors:
-            self.sensors[entity_id].async_schedule_update_ha_state()
-
-    async def async_update_info(self, now=None):
-        """Get the bridge info."""
-        locked = self.lock.acquire(False)
-        if not locked:
-            return
-        try:
-            bridges = get_bridges(self.hass)
-            if not bridges:
-                if now:
-                    # periodic task
-                    await asyncio.sleep(5)
-                return
-            await asyncio.wait(
-                [self.update_bridge(bridge) for bridge in bridges], loop=self.hass.loop
-            )
-        finally:
-            self.lock.release()
+    data = get_sensor_data(hass)
+    data.async_configure(config)
+    data.async_add_platform(["SML"], HueSensor, async_add_entities)
+    await data.async_start()
 
 
 class HueSensor(BinarySensorDevice):
@@ -218,7 +39,10 @@ class HueSensor(BinarySensorDevice):
     def __init__(self, hue_id, data):
         """Initialize the sensor object."""
         self._hue_id = hue_id
-        self._data = data.data  # data is in .data
+        self._data = data
+        self._record = data.data[hue_id]
+        self._unique_id = hue_id[+4:][:-3]
+        self._device_class = DEVICE_CLASSES.get(self._record.model)
 
     @property
     def should_poll(self):
@@ -228,35 +52,37 @@ class HueSensor(BinarySensorDevice):
     @property
     def name(self):
         """Return the name of the sensor."""
-        data = self._data.get(self._hue_id)
-        if data:
-            return data["name"]
+        return self._record.name
 
     @property
     def unique_id(self):
         """Return the ID of this Hue sensor."""
-        return self._hue_id[+4:][:-3]
+        return self._unique_id
+
+    @property
+    def available(self):
+        """Return False while the bridge of the sensor is unreachable."""
+        return self._data.available(self._hue_id)
 
     @property
     def is_on(self):
         """Return the state of the sensor."""
-        data = self._data.get(self._hue_id)
-        if data and data["model"] == "SML" and data["changed"]:
-            return data["state"] == STATE_ON
+        record = self._record
+        if record.model == "SML" and record.changed:
+            return record.state == STATE_ON
         return False
 
     @property
     def device_class(self):
         """Return the class of this device, from component DEVICE_CLASSES."""
-        data = self._data.get(self._hue_id)
-        if data:
-            device_class = DEVICE_CLASSES.get(data["model"])
-            if device_class:
-                return device_class
+        return self._device_class
 
     @property
     def device_state_attributes(self):
         """Attributes."""
-        data = self._data.get(self._hue_id)
-        if data:
-            return {key: data.get(key) for key in ATTRS.get(data["model"], [])}
+        return self._record.attributes
+
+    @callback
+    def async_record_updated(self):
+        """Write the state after the record of the sensor changed."""
+        self.async_write_ha_state()
@@ -0,0 +1,59 @@
+"""Health of a Hue bridge, backing off while it is unreachable."""
+import random
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+OPEN = "open"
+
+# Consecutive failures after which the breaker opens.
+FAILURE_THRESHOLD = 3
+# Delay after the first failure in seconds, doubled on each further one.
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 15.0
+
+
+class CircuitBreaker(object):
+    """Track the failures of a bridge and when to try it again.
+
+    A failed request makes the bridge degraded: it is retried after a
+    short, growing delay. After FAILURE_THRESHOLD failures in a row the
+    breaker opens, the sensors of the bridge become unavailable and it is
+    only probed with a cheap request until it answers again. Any success
+    makes it healthy at once.
+    """
+
+    def __init__(self):
+        """Initialize a healthy breaker."""
+        self.state = HEALTHY
+        self.failures = 0
+        self.retry_at = 0
+
+    @property
+    def is_open(self):
+        """Return True while the bridge is considered unreachable."""
+        return self.state == OPEN
+
+    def backoff(self):
+        """Return the delay before the next attempt, with jitter.
+
+        Half of the delay is random, so bridges and restarted instances
+        don't retry in lockstep.
+        """
+        delay = min(BASE_BACKOFF * 2 ** (self.failures - 1), MAX_BACKOFF)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def failed(self, now):
+        """Record a failure at loop time now, return True if the state changed."""
+        previous = self.state
+        self.failures += 1
+        self.state = OPEN if self.failures >= FAILURE_THRESHOLD else DEGRADED
+        self.retry_at = now + self.backoff()
+        return self.state != previous
+
+    def succeeded(self):
+        """Record a success, return True if the state changed."""
+        previous = self.state
+        self.state = HEALTHY
+        self.failures = 0
+        self.retry_at = 0
+        return self.state != previous
@@ -0,0 +1,80 @@
+"""Capture the /sensors responses of the Hue bridges for replay.
+
+A capture is a gzip file of JSON lines, one per successful poll of a
+bridge: {"time": <unix time>, "host": <bridge host>, "sensors": {...}}. It
+is written in chunks, so it can be read while being written and an
+interrupted capture still holds everything up to its last chunk.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import time
+
+import homeassistant.util.dt as dt_util
+import voluptuous as vol
+
+from .profiler import ATTR_SECONDS
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_CAPTURE = "capture"
+CAPTURE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SECONDS, default=300): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=86400)
+        )
+    }
+)
+# Seconds between writes of the polls captured meanwhile.
+FLUSH_INTERVAL = 5
+
+
+def capture_record(host, raw_sensors):
+    """Return the capture record of a poll of the bridge at host."""
+    # The raw sensors are replaced, not changed, so a shallow copy will do.
+    return {"time": time.time(), "host": host, "sensors": dict(raw_sensors)}
+
+
+def write_records(path, records):
+    """Append records to a capture, as a gzip member of their own."""
+    with gzip.open(path, "at", encoding="utf-8") as capture:
+        for record in records:
+            capture.write(json.dumps(record, separators=(",", ":")))
+            capture.write("\n")
+
+
+def read_records(path):
+    """Yield the records of a capture."""
+    with gzip.open(path, "rt", encoding="utf-8") as capture:
+        for line in capture:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def async_capture(hass, data, seconds):
+    """Capture the polls of all bridges for some seconds."""
+    if data.capture is not None:
+        _LOGGER.warning("A huesensor capture is already being recorded")
+        return
+    path = hass.config.path(
+        "huesensor_capture_{}.jsonl.gz".format(
+            dt_util.utcnow().strftime("%Y%m%d%H%M%S")
+        )
+    )
+    data.capture = []
+    end = hass.loop.time() + seconds
+    count = 0
+    try:
+        while data.capture is not None:
+            remaining = end - hass.loop.time()
+            if remaining > 0:
+                await asyncio.sleep(min(FLUSH_INTERVAL, remaining))
+            records = data.capture
+            data.capture = [] if remaining > FLUSH_INTERVAL else None
+            if records:
+                count += len(records)
+                await hass.async_add_executor_job(write_records, path, records)
+    finally:
+        data.capture = None
+    _LOGGER.info("Wrote %d huesensor polls to %s", count, path)
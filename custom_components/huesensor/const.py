@@ -0,0 +1,47 @@
+"""Constants for the huesensor component."""
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+
+DOMAIN = "huesensor"
+
+TYPE_GEOFENCE = "Geofence"
+
+EVENT_BUTTON = "huesensor_button"
+EVENT_GESTURE = "huesensor_gesture"
+
+CONF_MIN_SCAN_INTERVAL = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_EVENT_STREAM = "event_stream"
+CONF_TELEMETRY = "telemetry"
+CONF_TIERED_POLLING = "tiered_polling"
+CONF_RAW_CLIENT = "raw_client"
+CONF_REQUEST_SHARE = "request_share"
+CONF_GESTURES = "gestures"
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+CONF_TEMPERATURE_MIN_INTERVAL = "temperature_min_interval"
+CONF_LIGHT_LEVEL_DEADBAND = "light_level_deadband"
+CONF_LIGHT_LEVEL_MIN_INTERVAL = "light_level_min_interval"
+
+# Options of the shared poller, accepted by the sensor and binary_sensor
+# platforms alike.
+POLLING_SCHEMA = {
+    vol.Optional(CONF_MIN_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_MAX_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_EVENT_STREAM, default=False): cv.boolean,
+    vol.Optional(CONF_TIERED_POLLING, default=False): cv.boolean,
+    vol.Optional(CONF_RAW_CLIENT, default=False): cv.boolean,
+    vol.Optional(CONF_REQUEST_SHARE): vol.All(
+        vol.Coerce(float), vol.Range(min=0.05, max=1)
+    ),
+    vol.Optional(CONF_GESTURES, default={}): {
+        cv.string: vol.All(cv.ensure_list, [cv.string])
+    },
+    vol.Optional(CONF_TEMPERATURE_DEADBAND): vol.All(
+        vol.Coerce(float), vol.Range(min=0)
+    ),
+    vol.Optional(CONF_TEMPERATURE_MIN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_LIGHT_LEVEL_DEADBAND): vol.All(
+        vol.Coerce(float), vol.Range(min=0, max=100)
+    ),
+    vol.Optional(CONF_LIGHT_LEVEL_MIN_INTERVAL): cv.time_period,
+}
@@ -0,0 +1,1012 @@
+"""Shared polling of the Hue bridges for the huesensor platforms."""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+import aiohttp
+import async_timeout
+import homeassistant.util.dt as dt_util
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_EVENT_STREAM,
+    CONF_GESTURES,
+    CONF_LIGHT_LEVEL_DEADBAND,
+    CONF_LIGHT_LEVEL_MIN_INTERVAL,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_RAW_CLIENT,
+    CONF_REQUEST_SHARE,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_TEMPERATURE_MIN_INTERVAL,
+    CONF_TIERED_POLLING,
+    DOMAIN,
+    EVENT_BUTTON,
+    EVENT_GESTURE,
+    TYPE_GEOFENCE,
+)
+from .breaker import CircuitBreaker
+from .capture import CAPTURE_SCHEMA, SERVICE_CAPTURE, async_capture, capture_record
+from .deadband import MeasurementFilter
+from .event_stream import HueEventStream, apply_resource, sensor_id
+from .gestures import GestureEngine
+from .governor import BRIDGE_BUDGET, DEFAULT_SHARE, RequestGovernor
+from .hue_api_response import IncrementalParser, get_parser, sensor_key
+from .loop_lag import LoopLagMonitor
+from .profiler import ATTR_SECONDS, PROFILE_SCHEMA, SERVICE_PROFILE, async_profile
+from .raw_client import RawSensorsClient
+from .scheduler import PollScheduler
+from .telemetry import BridgeTelemetry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MIN_SCAN_INTERVAL = timedelta(seconds=0.1)
+DEFAULT_MAX_SCAN_INTERVAL = timedelta(seconds=1)
+# Seconds between reconciliation polls while the event stream is connected,
+# or between full polls with tiered polling.
+RECONCILE_INTERVAL = 60
+# Resource types fetched one by one between full polls with tiered polling.
+HOT_TYPES = ("ZLLPresence", "ZLLSwitch", "ZGPSwitch")
+# Seconds to wait for the answer to a probe of an unreachable bridge.
+PROBE_TIMEOUT = 2
+STORAGE_KEY = DOMAIN
+STORAGE_VERSION = 1
+# Seconds between saves of the sensor inventory.
+SAVE_DELAY = 60
+# Full polls a sensor can be missing from its bridge before it is evicted.
+EVICT_AFTER_POLLS = 3
+# Seconds a bridge can be gone before its sensors are evicted.
+REMOVED_BRIDGE_TIMEOUT = 300
+# Reconciliation is put off this many times longer while the loop lags.
+SHED_RECONCILE_FACTOR = 5
+
+
+def get_bridges(hass):
+    from homeassistant.components import hue
+    from homeassistant.components.hue.bridge import HueBridge
+
+    return [
+        entry
+        for entry in hass.data[hue.DOMAIN].values()
+        if isinstance(entry, HueBridge) and entry.api
+    ]
+
+
+async def update_api(api, telemetry=None):
+    import aiohue
+
+    started = time.monotonic()
+    try:
+        with async_timeout.timeout(10):
+            await api.update()
+    except (asyncio.TimeoutError, aiohttp.ClientError, aiohue.AiohueException) as err:
+        _LOGGER.debug("Failed to fetch sensors: %s", err)
+        if telemetry is not None:
+            telemetry.request_failed(isinstance(err, asyncio.TimeoutError))
+        return False
+    if telemetry is not None:
+        telemetry.request_done(time.monotonic() - started)
+    return True
+
+
+async def update_sensors(api, sensor_ids, telemetry=None):
+    """Fetch single sensors of a bridge, return them by id or None on failure.
+
+    The sensors the bridge answers with an error for, deleted ones most
+    likely, are left out; they don't fail the others.
+    """
+    import aiohue
+
+    started = time.monotonic()
+    try:
+        with async_timeout.timeout(10):
+            results = await asyncio.gather(
+                *(
+                    api.request("get", "sensors/" + sensor_id)
+                    for sensor_id in sensor_ids
+                ),
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(
+                result, aiohue.AiohueException
+            ):
+                raise result
+    except (asyncio.TimeoutError, aiohttp.ClientError, aiohue.AiohueException) as err:
+        _LOGGER.debug("Failed to fetch sensors: %s", err)
+        if telemetry is not None:
+            telemetry.request_failed(isinstance(err, asyncio.TimeoutError))
+        return None
+    if telemetry is not None:
+        telemetry.request_done(time.monotonic() - started)
+    sensors = {}
+    for raw_id, result in zip(sensor_ids, results):
+        if isinstance(result, aiohue.AiohueException):
+            _LOGGER.debug("Failed to fetch sensor %s: %s", raw_id, result)
+        else:
+            sensors[raw_id] = result
+    return sensors
+
+
+async def update_raw(client, telemetry=None):
+    """Fetch the /sensors list with the slim client, return it or None on failure."""
+    started = time.monotonic()
+    try:
+        with async_timeout.timeout(10):
+            sensors = await client.fetch()
+    except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as err:
+        _LOGGER.debug("Failed to fetch sensors: %s", err)
+        if telemetry is not None:
+            telemetry.request_failed(isinstance(err, asyncio.TimeoutError))
+        return None
+    if telemetry is not None:
+        telemetry.request_done(time.monotonic() - started)
+    return sensors
+
+
+async def probe_bridge(api):
+    """Return True if the bridge answers a cheap request."""
+    import aiohue
+
+    try:
+        with async_timeout.timeout(PROBE_TIMEOUT):
+            await api.request("get", "config")
+    except (asyncio.TimeoutError, aiohttp.ClientError, aiohue.AiohueException) as err:
+        _LOGGER.debug("Failed to probe bridge: %s", err)
+        return False
+    return True
+
+
+def get_sensor_data(hass):
+    """Return the data manager shared by all platforms, creating it if needed."""
+    if DOMAIN not in hass.data:
+        hass.data[DOMAIN] = HueSensorData(hass)
+    return hass.data[DOMAIN]
+
+
+class HueSensorData(object):
+    """Poll every bridge once per tick and feed the subscribed platforms."""
+
+    def __init__(self, hass):
+        """Initialize the data object."""
+        self.hass = hass
+        self.data = {}
+        self.sensors = {}
+        self.hosts = {}
+        self.pending_writes = set()
+        # Writes of attribute changes held back while the loop lags.
+        self.deferred_writes = set()
+        self.button_events = {}
+        self.missing = {}
+        self.removed_bridges = {}
+        self.parser = IncrementalParser()
+        self.measurement_filter = MeasurementFilter()
+        self.gestures = GestureEngine()
+        # Seconds on a monotonic clock, timing presses and measurements.
+        # A replay hands in the time of the captured polls instead.
+        self.clock = time.monotonic
+        self.platforms = []
+        self.listeners = []
+        self.schedulers = {}
+        self.breakers = {}
+        self.governors = {}
+        self.request_share = None
+        self.raw_sensors = {}
+        self.geofences = {}
+        self.raw_client = False
+        self.raw_clients = {}
+        self.streams = {}
+        self.event_stream = False
+        self.tiered_polling = False
+        self.hot_sensors = {}
+        self.reconciled = {}
+        # Keys of the records in the last full poll, per bridge.
+        self.record_keys = {}
+        self.telemetry = {}
+        self.telemetry_entities = {}
+        self.telemetry_platform = None
+        # A PhaseTimer while a profile is recorded.
+        self.phases = None
+        # The polls captured since the last write, while a capture is recorded.
+        self.capture = None
+        self.fetches = {}
+        self.lag_monitor = None
+        self.min_scan_interval = None
+        self.max_scan_interval = None
+        # Scan interval of the device tracker, None without one.
+        self.tracker_interval = None
+        self.store = None
+        self._save_scheduled = False
+        self._started = False
+        self._unsub_tick = None
+
+    @callback
+    def async_configure(self, config):
+        """Apply the polling options of a platform config.
+
+        The platforms share the poller, so the fastest setting given by any
+        of them wins.
+        """
+        if config.get(CONF_EVENT_STREAM):
+            self.event_stream = True
+        if config.get(CONF_TIERED_POLLING):
+            self.tiered_polling = True
+        if config.get(CONF_RAW_CLIENT):
+            self.raw_client = True
+        self.gestures.configure(config.get(CONF_GESTURES, {}))
+        for attr, conf_key in (
+            ("min_scan_interval", CONF_MIN_SCAN_INTERVAL),
+            ("max_scan_interval", CONF_MAX_SCAN_INTERVAL),
+        ):
+            value = config.get(conf_key)
+            current = getattr(self, attr)
+            if value is not None and (current is None or value < current):
+                setattr(self, attr, value)
+        share = config.get(CONF_REQUEST_SHARE)
+        if share is not None and (
+            self.request_share is None or share > self.request_share
+        ):
+            self.request_share = share
+        for name, deadband_key, interval_key, scale in (
+            (
+                "temperature",
+                CONF_TEMPERATURE_DEADBAND,
+                CONF_TEMPERATURE_MIN_INTERVAL,
+                1,
+            ),
+            (
+                "light_level",
+                CONF_LIGHT_LEVEL_DEADBAND,
+                CONF_LIGHT_LEVEL_MIN_INTERVAL,
+                100,
+            ),
+        ):
+            deadband = config.get(deadband_key)
+            min_interval = config.get(interval_key)
+            self.measurement_filter.configure(
+                name,
+                deadband / scale if deadband is not None else None,
+                min_interval.total_seconds() if min_interval is not None else None,
+            )
+        self._async_intervals_changed()
+
+    @callback
+    def async_add_tracker(self, interval):
+        """Poll at the interval of the device tracker while no platform subscribed.
+
+        Geofences don't need the fast cadence of buttons and motion.
+        """
+        if self.tracker_interval is None or interval < self.tracker_interval:
+            self.tracker_interval = interval
+            self._async_intervals_changed()
+
+    @callback
+    def _async_intervals_changed(self):
+        """Apply changed poll intervals and request rates to every bridge."""
+        fast, slow = self._intervals()
+        for scheduler in self.schedulers.values():
+            scheduler.set_intervals(fast, slow)
+        for governor in self.governors.values():
+            governor.rate = self._request_rate()
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._track_tick()
+
+    def _intervals(self):
+        """Return the fast and slow poll intervals in seconds.
+
+        A poll takes one request, tiered ones about as many; the fast
+        interval is kept within the request rate, so the polls aren't
+        held back by the governor.
+        """
+        if not self.platforms and self.tracker_interval is not None:
+            interval = self.tracker_interval.total_seconds()
+            return interval, interval
+        fast = self.min_scan_interval or DEFAULT_MIN_SCAN_INTERVAL
+        slow = self.max_scan_interval or DEFAULT_MAX_SCAN_INTERVAL
+        fast = max(fast.total_seconds(), 1 / self._request_rate())
+        return fast, slow.total_seconds()
+
+    def _track_tick(self):
+        """Tick at the fast cadence, bridges are polled when they are due."""
+        self._unsub_tick = async_track_time_interval(
+            self.hass, self.async_update_info, timedelta(seconds=self._intervals()[0])
+        )
+
+    def _scheduler(self, bridge):
+        """Return the poll scheduler of a bridge."""
+        scheduler = self.schedulers.get(bridge.host)
+        if scheduler is None:
+            scheduler = self.schedulers[bridge.host] = PollScheduler(*self._intervals())
+        return scheduler
+
+    def _request_rate(self):
+        """Return the requests per second each bridge may get."""
+        return BRIDGE_BUDGET * (self.request_share or DEFAULT_SHARE)
+
+    def _governor(self, bridge):
+        """Return the request governor of a bridge."""
+        governor = self.governors.get(bridge.host)
+        if governor is None:
+            governor = self.governors[bridge.host] = RequestGovernor(
+                self._request_rate()
+            )
+        return governor
+
+    def _breaker(self, bridge):
+        """Return the circuit breaker of a bridge."""
+        breaker = self.breakers.get(bridge.host)
+        if breaker is None:
+            breaker = self.breakers[bridge.host] = CircuitBreaker()
+        return breaker
+
+    def _raw_client(self, bridge):
+        """Return the slim /sensors client of a bridge."""
+        client = self.raw_clients.get(bridge.host)
+        if client is None:
+            client = self.raw_clients[bridge.host] = RawSensorsClient(
+                async_get_clientsession(self.hass),
+                bridge.host,
+                bridge.api.username,
+            )
+        return client
+
+    @property
+    def shedding(self):
+        """Return True while the event loop lags and work is shed."""
+        return self.lag_monitor is not None and self.lag_monitor.shedding
+
+    def available(self, key):
+        """Return False while the bridge of a sensor is unreachable."""
+        breaker = self.breakers.get(self.hosts.get(key))
+        return breaker is None or not breaker.is_open
+
+    async def async_start(self):
+        """Restore the saved sensors and start polling, once for all platforms.
+
+        The entities are created from the sensors saved by the previous run,
+        so startup doesn't wait for the bridges. The first poll runs in the
+        background and brings them up to date.
+        """
+        if self._started:
+            return
+        self._started = True
+        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+        self.hass.services.async_register(
+            DOMAIN, SERVICE_PROFILE, self._async_profile, schema=PROFILE_SCHEMA
+        )
+        self.hass.services.async_register(
+            DOMAIN, SERVICE_CAPTURE, self._async_capture, schema=CAPTURE_SCHEMA
+        )
+        store = Store(self.hass, STORAGE_VERSION, STORAGE_KEY)
+        # Restored sensors are what is saved already, not new ones to save.
+        await self._async_restore(store)
+        self.store = store
+        self.hass.async_create_task(self.async_update_info())
+        self._track_tick()
+        self.async_watch_loop_lag()
+
+    @callback
+    def async_watch_loop_lag(self):
+        """Shed the work that can wait while the event loop lags.
+
+        Reconciliation is put off, attribute changes aren't written and
+        the listeners aren't called. Buttons and motion go on as usual.
+        """
+        if self.lag_monitor is None:
+            self.lag_monitor = LoopLagMonitor(self.hass.loop, self._async_lag_changed)
+            self.lag_monitor.start()
+
+    @callback
+    def _async_lag_changed(self, shedding):
+        """Catch up on the shed work once the loop recovered."""
+        if shedding:
+            _LOGGER.info(
+                "Event loop lags %.0f ms, polling Hue buttons and motion only",
+                1000 * self.lag_monitor.lag,
+            )
+            return
+        _LOGGER.info("Event loop recovered, polling Hue sensors in full")
+        self.pending_writes.update(self.deferred_writes)
+        self.deferred_writes = set()
+        self.async_flush()
+        for update_callback in self.listeners:
+            update_callback()
+
+    async def _async_profile(self, call):
+        """Handle the profile service."""
+        await async_profile(self.hass, self, call.data[ATTR_SECONDS])
+
+    async def _async_capture(self, call):
+        """Handle the capture service."""
+        await async_capture(self.hass, self, call.data[ATTR_SECONDS])
+
+    async def _async_restore(self, store):
+        """Process the sensors saved by the previous run."""
+        stored = await store.async_load()
+        if not stored:
+            return
+        for host, raw_sensors in stored["bridges"].items():
+            self.raw_sensors.setdefault(host, raw_sensors)
+            self.process_sensors(raw_sensors.values(), host)
+        # Presses made while we were down happened before we started, the
+        # first live poll only remembers them.
+        self.button_events.clear()
+        _LOGGER.debug("Restored %d sensors", len(self.data))
+
+    @callback
+    def _async_schedule_save(self):
+        """Save the sensors of all bridges within SAVE_DELAY seconds.
+
+        Called when sensors are added or evicted; their state is saved along
+        with them, and on stop.
+        """
+        if self.store is None or self._save_scheduled:
+            return
+        self._save_scheduled = True
+        self.store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self):
+        """Return the sensors of all bridges to save."""
+        self._save_scheduled = False
+        return {"bridges": self.raw_sensors}
+
+    @callback
+    def _async_stop(self, event):
+        """Close the event streams, cancel the fetches in flight and save."""
+        if self.lag_monitor is not None:
+            self.lag_monitor.stop()
+        for stream in self.streams.values():
+            stream.stop()
+        for fetch in self.fetches.values():
+            fetch.cancel()
+        if self.store is not None and not self._save_scheduled:
+            # A pending save is written by the store itself on stop.
+            self.hass.async_create_task(self.store.async_save(self._data_to_save()))
+
+    @callback
+    def async_add_platform(self, models, entity_factory, async_add_entities):
+        """Subscribe a platform to the sensors of the given models."""
+        platform = (frozenset(models), entity_factory, async_add_entities)
+        self.platforms.append(platform)
+        if len(self.platforms) == 1 and self.tracker_interval is not None:
+            # Polled for the device tracker so far, switch to the fast cadence.
+            self._async_intervals_changed()
+        self._async_add_entities(platform, list(self.data))
+
+    @callback
+    def _async_add_entities(self, platform, keys):
+        """Create the entities of a platform for the given sensor keys."""
+        models, entity_factory, async_add_entities = platform
+        new_entities = {
+            key: entity_factory(key, self)
+            for key in keys
+            if self.data[key].model in models
+        }
+        if not new_entities:
+            return
+        _LOGGER.debug("Created %s", ", ".join(new_entities.keys()))
+        for key, entity in new_entities.items():
+            self.sensors.setdefault(key, []).append(entity)
+        async_add_entities(new_entities.values())
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Call update_callback after every successful poll of a bridge."""
+        self.listeners.append(update_callback)
+
+        def remove_listener():
+            self.listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_enable_telemetry(self, entity_factory, async_add_entities):
+        """Collect telemetry per bridge, exposed through the given platform."""
+        self.telemetry_platform = (entity_factory, async_add_entities)
+        for host, telemetry in self.telemetry.items():
+            entity = self.telemetry_entities[host] = entity_factory(telemetry)
+            async_add_entities([entity])
+
+    def _telemetry(self, bridge):
+        """Return the telemetry of a bridge, or None if not enabled."""
+        if self.telemetry_platform is None:
+            return None
+        telemetry = self.telemetry.get(bridge.host)
+        if telemetry is None:
+            telemetry = self.telemetry[bridge.host] = BridgeTelemetry(bridge.host)
+            entity_factory, async_add_entities = self.telemetry_platform
+            entity = self.telemetry_entities[bridge.host] = entity_factory(telemetry)
+            async_add_entities([entity])
+        return telemetry
+
+    async def update_bridge(self, bridge):
+        started = self.hass.loop.time()
+        active = False
+        telemetry = self._telemetry(bridge)
+        breaker = self._breaker(bridge)
+        reconcile = self._reconcile_due(bridge, started)
+        wait = self._throttle(bridge, breaker, reconcile, started)
+        if wait and reconcile and self._tiered(bridge) and not breaker.is_open:
+            # Reconcile later, the buttons and motion can't wait.
+            reconcile = False
+            wait = self._throttle(bridge, breaker, reconcile, started)
+        if wait:
+            _LOGGER.debug("Holding back a fetch of %s for %.2fs", bridge.host, wait)
+            if telemetry is not None:
+                telemetry.request_throttled()
+            self._scheduler(bridge).defer(started, wait)
+            return
+        phases = self.phases
+        if phases is not None:
+            mark = time.perf_counter()
+        if breaker.is_open and not await probe_bridge(bridge.api):
+            available = False
+        elif reconcile:
+            sensors = await self._async_update_all(bridge, telemetry)
+            available = sensors is not None
+            if available:
+                self._async_reconciled(bridge, sensors, started)
+        else:
+            available = await self._async_update_hot(bridge, telemetry)
+            if available is None:
+                # No hot sensors, nothing was fetched until the next full poll.
+                self._scheduler(bridge).polled(started, False)
+                return
+        if phases is not None:
+            phases.lap("fetch", mark)
+        if available:
+            raw_sensors = self.raw_sensors[bridge.host]
+            if self.capture is not None:
+                self.capture.append(capture_record(bridge.host, raw_sensors))
+            parse_started = time.perf_counter()
+            active = self.process_sensors(raw_sensors.values(), bridge.host)
+            if telemetry is not None:
+                telemetry.parsed(time.perf_counter() - parse_started)
+            if not self.shedding:
+                for update_callback in self.listeners:
+                    update_callback()
+
+        scheduler = self._scheduler(bridge)
+        scheduler.polled(started, active)
+        if available:
+            if breaker.succeeded():
+                self._async_health_changed(bridge, breaker)
+        else:
+            if breaker.failed(started):
+                self._async_health_changed(bridge, breaker)
+            scheduler.defer(started, breaker.retry_at - started)
+        self.async_flush()
+        stream = self._stream(bridge)
+        if stream is not None and stream.connected:
+            scheduler.defer(started, self._reconcile_interval())
+
+    def _throttle(self, bridge, breaker, reconcile, now):
+        """Take the request budget of the next fetch of a bridge.
+
+        Return 0 if the fetch may go ahead, otherwise the seconds to wait.
+        The fetches of buttons and motion go first; those are the full
+        polls unless tiered polling or the event stream take care of them.
+        """
+        if breaker.is_open:
+            requests, priority = 1, False
+        elif reconcile:
+            stream = self.streams.get(bridge.host)
+            requests = 1
+            priority = not self._tiered(bridge) and not (stream and stream.connected)
+        else:
+            requests, priority = len(self._hot_batch(bridge)), True
+        return self._governor(bridge).acquire(requests, now, priority)
+
+    def _reconcile_interval(self):
+        """Return the seconds between reconciliation polls."""
+        if self.shedding:
+            return RECONCILE_INTERVAL * SHED_RECONCILE_FACTOR
+        return RECONCILE_INTERVAL
+
+    def _reconcile_due(self, bridge, now):
+        """Return True if the whole /sensors list of a bridge should be fetched.
+
+        That is always the case unless the bridge is polled tiered.
+        """
+        if not self._tiered(bridge):
+            return True
+        return now - self.reconciled[bridge.host] >= self._reconcile_interval()
+
+    def _tiered(self, bridge):
+        """Return True if the hot sensors of a bridge are fetched between full polls.
+
+        That takes tiered polling and a full poll telling the hot sensors.
+        Their requests also have to fit about one fast tick's worth of the
+        request budget; a full poll gets the buttons and motion of a bigger
+        fleet in sooner than fetches held back by the budget.
+        """
+        if not self.tiered_polling or bridge.host not in self.reconciled:
+            return False
+        per_tick = self._governor(bridge).rate * self._intervals()[0]
+        return len(self.hot_sensors[bridge.host]) <= max(per_tick, 1)
+
+    async def _async_update_all(self, bridge, telemetry):
+        """Fetch the whole /sensors list of a bridge, return it by id or None."""
+        if self.raw_client:
+            return await update_raw(self._raw_client(bridge), telemetry)
+        if not await update_api(bridge.api.sensors, telemetry):
+            return None
+        return {sensor.id: sensor.raw for sensor in bridge.api.sensors.values()}
+
+    @callback
+    def _async_reconciled(self, bridge, sensors, now):
+        """Take over the raw sensors of a full poll of a bridge."""
+        old_raw_sensors = self.raw_sensors.get(bridge.host, {})
+        raw_sensors = self.raw_sensors[bridge.host] = {
+            sensor_id: raw
+            for sensor_id, raw in sensors.items()
+            if raw["type"] != TYPE_GEOFENCE
+        }
+        self.geofences[bridge.host] = {
+            sensor_id: raw
+            for sensor_id, raw in sensors.items()
+            if raw["type"] == TYPE_GEOFENCE
+        }
+        # Compared by record key, a sensor paired again under another
+        # uniqueid can keep its id.
+        record_keys = {sensor_key(raw) for raw in raw_sensors.values()}
+        if record_keys != self.record_keys.get(bridge.host) or self.missing:
+            uniqueids = {raw.get("uniqueid") for raw in raw_sensors.values()}
+            self.parser.forget_resources(
+                raw.get("uniqueid")
+                for raw in old_raw_sensors.values()
+                if raw.get("uniqueid") not in uniqueids
+            )
+            self._async_track_missing(bridge.host, record_keys)
+        self.record_keys[bridge.host] = record_keys
+        self.reconciled[bridge.host] = now
+        self.hot_sensors[bridge.host] = [
+            sensor_id
+            for sensor_id, raw in raw_sensors.items()
+            if raw["type"] in HOT_TYPES and get_parser(raw) is not None
+        ]
+
+    @callback
+    def _async_track_missing(self, host, live):
+        """Evict the sensors of a bridge missing from EVICT_AFTER_POLLS full polls.
+
+        live are the record keys of the last full poll. Sensors deleted from
+        the bridge or paired again under another uniqueid would otherwise
+        stay in memory forever.
+        """
+        for key in [key for key, key_host in self.hosts.items() if key_host == host]:
+            if key in live:
+                self.missing.pop(key, None)
+                continue
+            missing = self.missing[key] = self.missing.get(key, 0) + 1
+            if missing >= EVICT_AFTER_POLLS:
+                self._async_evict(key)
+
+    @callback
+    def _async_track_removed_bridges(self, bridges, now):
+        """Evict the sensors of bridges gone for REMOVED_BRIDGE_TIMEOUT seconds."""
+        hosts = {bridge.host for bridge in bridges}
+        for host in [host for host in self.removed_bridges if host in hosts]:
+            del self.removed_bridges[host]
+        for host in [host for host in self.raw_sensors if host not in hosts]:
+            since = self.removed_bridges.setdefault(host, now)
+            if now - since >= REMOVED_BRIDGE_TIMEOUT:
+                self._async_evict_bridge(host)
+
+    @callback
+    def _async_evict(self, key):
+        """Forget a sensor and remove its entities."""
+        _LOGGER.debug("Evicting %s, it is gone from its bridge", key)
+        del self.data[key]
+        self.hosts.pop(key, None)
+        self.missing.pop(key, None)
+        self.button_events.pop(key, None)
+        self.pending_writes.discard(key)
+        self.deferred_writes.discard(key)
+        self.parser.forget(key)
+        self.measurement_filter.forget(key)
+        self.gestures.forget(key)
+        for entity in self.sensors.pop(key, ()):
+            self.hass.async_create_task(entity.async_remove())
+        self._async_schedule_save()
+
+    @callback
+    def _async_evict_bridge(self, host):
+        """Forget a removed bridge and evict its sensors."""
+        _LOGGER.info("Hue bridge %s is gone, removing its sensors", host)
+        for key in [key for key, key_host in self.hosts.items() if key_host == host]:
+            self._async_evict(key)
+        raw_sensors = self.raw_sensors.pop(host)
+        self.parser.forget_resources(
+            raw.get("uniqueid") for raw in raw_sensors.values()
+        )
+        for per_bridge in (
+            self.geofences,
+            self.raw_clients,
+            self.schedulers,
+            self.breakers,
+            self.governors,
+            self.hot_sensors,
+            self.reconciled,
+            self.record_keys,
+            self.removed_bridges,
+            self.telemetry,
+        ):
+            per_bridge.pop(host, None)
+        entity = self.telemetry_entities.pop(host, None)
+        if entity is not None:
+            self.hass.async_create_task(entity.async_remove())
+        stream = self.streams.pop(host, None)
+        if stream is not None:
+            stream.stop()
+        self._async_schedule_save()
+
+    def _hot_batch(self, bridge):
+        """Return the hot sensors of a bridge to fetch next.
+
+        A fetch takes at most the request budget of a burst; the sensors
+        beyond it take turns.
+        """
+        sensor_ids = self.hot_sensors.get(bridge.host, [])
+        return sensor_ids[: int(self._governor(bridge).capacity)]
+
+    async def _async_update_hot(self, bridge, telemetry):
+        """Fetch the buttons and presence of a bridge one by one.
+
+        This leaves out the slow moving and ignored resources of the full
+        /sensors list. Return True on success, None if there was nothing to
+        fetch.
+        """
+        sensor_ids = self._hot_batch(bridge)
+        if not sensor_ids:
+            return None
+        rest = self.hot_sensors[bridge.host][len(sensor_ids) :]
+        if rest:
+            self.hot_sensors[bridge.host] = rest + sensor_ids
+        sensors = await update_sensors(bridge.api, sensor_ids, telemetry)
+        if sensors is None:
+            return False
+        gone = set(sensor_ids) - sensors.keys()
+        if gone:
+            # Sensors deleted since the last full poll: stop fetching them
+            # and make the next poll a full one, to find out what changed.
+            self.hot_sensors[bridge.host] = [
+                sensor_id
+                for sensor_id in self.hot_sensors[bridge.host]
+                if sensor_id not in gone
+            ]
+            self.reconciled.pop(bridge.host, None)
+        self.raw_sensors[bridge.host].update(sensors)
+        return True
+
+    @callback
+    def _async_health_changed(self, bridge, breaker):
+        """Log the health of a bridge and refresh the availability of its sensors."""
+        if breaker.is_open:
+            _LOGGER.warning(
+                "Hue bridge %s is unreachable, probing it with a growing delay",
+                bridge.host,
+            )
+        else:
+            _LOGGER.debug("Hue bridge %s is %s", bridge.host, breaker.state)
+        self.pending_writes.update(
+            key for key, host in self.hosts.items() if host == bridge.host
+        )
+
+    def _stream(self, bridge):
+        """Return the event stream of a bridge, starting it if enabled."""
+        if not self.event_stream:
+            return None
+        stream = self.streams.get(bridge.host)
+        if stream is None:
+            stream = self.streams[bridge.host] = HueEventStream(
+                async_get_clientsession(self.hass, verify_ssl=False),
+                "https://{}".format(bridge.host),
+                bridge.api.username,
+                lambda resource, updated: self._async_stream_resource(
+                    bridge, resource, updated
+                ),
+                lambda connected: self._async_stream_connected(bridge, connected),
+            )
+            stream.start(self.hass.loop)
+        return stream
+
+    @callback
+    def _async_stream_connected(self, bridge, connected):
+        """Fall back to regular polling while the stream is down."""
+        _LOGGER.debug(
+            "Event stream of %s %s",
+            bridge.host,
+            "connected" if connected else "disconnected",
+        )
+        if not connected:
+            self._scheduler(bridge).poll_now()
+
+    @callback
+    def _async_stream_resource(self, bridge, resource, updated):
+        """Apply a pushed resource delta to the sensor it belongs to."""
+        raw_sensors = self.raw_sensors.get(bridge.host, {})
+        raw_id = sensor_id(resource)
+        raw = raw_sensors.get(raw_id)
+        if raw is None:
+            return
+        raw = apply_resource(
+            raw, resource, updated, self.streams[bridge.host].control_ids
+        )
+        if raw is None:
+            self._scheduler(bridge).poll_now()
+            return
+        raw_sensors[raw_id] = raw
+
+        # The records of a device can span several resources, reparse them all.
+        device = raw.get("uniqueid", "")[:-5]
+        self.process_sensors(
+            (
+                other
+                for other in raw_sensors.values()
+                if other.get("uniqueid", "")[:-5] == device
+            ),
+            bridge.host,
+        )
+        self.async_flush()
+
+    @callback
+    def process_sensors(self, raw_sensors, host=None):
+        """Parse the raw sensors of the bridge at host and update the records.
+
+        Only the sensors that changed since the last call are parsed and
+        compared. Their entities are written by the next async_flush.
+        Return True if a button was pressed or a motion state changed.
+        """
+        phases = self.phases
+        if phases is not None:
+            mark = time.perf_counter()
+        data = self.parser.parse(raw_sensors)
+        if phases is not None:
+            mark = phases.lap("parse", mark)
+        telemetry = self.telemetry.get(host)
+
+        new_sensors = data.keys() - self.data.keys()
+        updated_sensors = []
+        now = self.clock()
+        for key, new in data.items():
+            if new.button:
+                self._async_fire_button_event(key, new, now)
+            old = self.data.get(key)
+            if old is None:
+                self.data[key] = new
+                self.hosts[key] = host
+                continue
+            if self.measurement_filter.hold(key, old, new, now):
+                # Look at the held back measurement again on the next poll.
+                self.parser.forget(key)
+            if old.update_from(new):
+                updated_sensors.append(key)
+
+        if new_sensors:
+            for platform in self.platforms:
+                self._async_add_entities(platform, new_sensors)
+            self._async_schedule_save()
+        if self.shedding:
+            for key in updated_sensors:
+                if self.data[key].changed:
+                    self.pending_writes.add(key)
+                else:
+                    self.deferred_writes.add(key)
+        else:
+            self.pending_writes.update(updated_sensors)
+
+        if telemetry is not None and updated_sensors:
+            now = dt_util.utcnow()
+            for key in updated_sensors:
+                record = self.data[key]
+                if record.changed and record.last_updated is not None:
+                    telemetry.state_written((now - record.last_updated).total_seconds())
+        if phases is not None:
+            phases.lap("diff", mark)
+        return any(self.data[key].changed for key in updated_sensors)
+
+    @callback
+    def async_flush(self):
+        """Tell the entities whose sensors changed, once each.
+
+        A tick can update a sensor from several resources, or a burst of
+        pushed events; the entities write their state in one go instead of
+        scheduling a job for each update.
+        """
+        phases = self.phases
+        if phases is not None:
+            mark = time.perf_counter()
+        pending, self.pending_writes = self.pending_writes, set()
+        for key in pending:
+            for entity in self.sensors.get(key, ()):
+                entity.async_record_updated()
+        if phases is not None:
+            phases.lap("write", mark)
+
+    @callback
+    def _async_fire_button_event(self, key, record, now):
+        """Fire an event for a button press not seen before, and its gestures.
+
+        A press is identified by its timestamp and button event. The first
+        sight of a remote only remembers its last press, which happened
+        before we started. A press older than the last one seen, from a
+        poll that started before a pushed press, is ignored.
+        """
+        if record.last_updated is None:
+            return
+        press = (record.last_updated, record.state)
+        last_press = self.button_events.get(key)
+        if last_press is not None and (press == last_press or press[0] < last_press[0]):
+            return
+        self.button_events[key] = press
+        if last_press is None:
+            return
+        self.hass.bus.async_fire(
+            EVENT_BUTTON,
+            {
+                "uniqueid": key,
+                "name": record.name,
+                "model": record.model,
+                "event": record.state,
+                "last_updated": record.last_updated.isoformat(),
+            },
+        )
+        for gesture, button, sequence in self.gestures.pressed(
+            key, record.model, record.state, now
+        ):
+            self.hass.bus.async_fire(
+                EVENT_GESTURE,
+                {
+                    "uniqueid": key,
+                    "name": record.name,
+                    "model": record.model,
+                    "gesture": gesture,
+                    "button": button,
+                    "sequence": sequence,
+                },
+            )
+
+    @callback
+    def _async_fetch(self, bridge, now):
+        """Return the fetch of a bridge in flight or due at now, or None.
+
+        Every bridge is fetched in its own task, so a slow bridge doesn't
+        hold up the others. A tick coming in while a fetch is in flight
+        joins it rather than starting another one.
+        """
+        fetch = self.fetches.get(bridge.host)
+        if fetch is not None:
+            if bridge.host in self.telemetry:
+                self.telemetry[bridge.host].tick_joined()
+            return fetch
+        if not self._scheduler(bridge).due(now):
+            return None
+        fetch = self.fetches[bridge.host] = self.hass.async_create_task(
+            self.update_bridge(bridge)
+        )
+        fetch.add_done_callback(lambda _: self._fetch_done(bridge.host, fetch))
+        return fetch
+
+    def _fetch_done(self, host, fetch):
+        """Forget a finished fetch."""
+        if self.fetches.get(host) is fetch:
+            del self.fetches[host]
+
+    async def async_update_info(self, now=None):
+        """Get the bridge info."""
+        bridges = get_bridges(self.hass)
+        loop_time = self.hass.loop.time()
+        self._async_track_removed_bridges(bridges, loop_time)
+        fetches = [self._async_fetch(bridge, loop_time) for bridge in bridges]
+        fetches = [fetch for fetch in fetches if fetch is not None]
+        if fetches:
+            await asyncio.wait(fetches)
@@ -0,0 +1,93 @@
+"""Deadband and rate limit for the measurements of the Hue motion sensors."""
+from collections import namedtuple
+
+# A measurement of a record: the fields it sets, the field compared against
+# the deadband, and whether the deadband is a fraction of the last value.
+Measurement = namedtuple("Measurement", ["name", "fields", "value", "relative"])
+
+MEASUREMENTS = {
+    "SML": (
+        Measurement("temperature", ("temperature",), "temperature", False),
+        Measurement("light_level", ("light_level", "lx"), "lx", True),
+    )
+}
+# Degrees Celsius, and a fraction of the last light level in lux.
+DEFAULT_DEADBANDS = {"temperature": 0.2, "light_level": 0.05}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class MeasurementFilter(object):
+    """Hold back measurement changes nobody needs at polling resolution.
+
+    A measurement is only written when it moved past its deadband from the
+    last written value, and no sooner than its minimum interval after the
+    previous write. Everything else of a record, like presence, passes
+    through at once.
+    """
+
+    def __init__(self):
+        """Initialize with the default deadbands and no rate limit."""
+        self.deadbands = {}
+        self.min_intervals = {}
+        self._written = {}
+
+    def configure(self, name, deadband=None, min_interval=None):
+        """Set the deadband and minimum interval in seconds of a measurement.
+
+        Platforms share the filter, so the smallest value given wins.
+        """
+        for settings, value in (
+            (self.deadbands, deadband),
+            (self.min_intervals, min_interval),
+        ):
+            if value is not None and value < settings.get(name, value + 1):
+                settings[name] = value
+
+    def deadband(self, name):
+        """Return the deadband of a measurement."""
+        return self.deadbands.get(name, DEFAULT_DEADBANDS.get(name, 0))
+
+    def _within_deadband(self, measurement, old_value, new_value):
+        if not _is_number(old_value) or not _is_number(new_value):
+            return False
+        deadband = self.deadband(measurement.name)
+        if measurement.relative:
+            deadband *= abs(old_value)
+        return abs(new_value - old_value) <= deadband
+
+    def hold(self, key, old, new, now):
+        """Hold back the small or too frequent measurement changes of new.
+
+        Held back fields get their old values again, so update_from doesn't
+        see them. Return True if a change was held back only for its
+        minimum interval, and the record should be looked at again later.
+        """
+        retry = False
+        for measurement in MEASUREMENTS.get(old.model, ()):
+            old_value = getattr(old, measurement.value)
+            new_value = getattr(new, measurement.value)
+            if old_value == new_value:
+                continue
+            written_key = (key, measurement.name)
+            last_write = self._written.get(written_key)
+            min_interval = self.min_intervals.get(measurement.name, 0)
+            if self._within_deadband(measurement, old_value, new_value):
+                pass
+            elif last_write is not None and now - last_write < min_interval:
+                retry = True
+            else:
+                self._written[written_key] = now
+                continue
+            for field in measurement.fields:
+                setattr(new, field, getattr(old, field))
+        return retry
+
+    def forget(self, key):
+        """Drop the write times of the measurements of a record."""
+        for written_key in [
+            written_key for written_key in self._written if written_key[0] == key
+        ]:
+            del self._written[written_key]
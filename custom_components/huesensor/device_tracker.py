@@ -4,11 +4,9 @@ Sensor for checking the status of Hue sensors.
 For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/sensor.hue/
 """
-import asyncio
 import logging
 from datetime import timedelta
 
-import async_timeout
 import homeassistant.util.dt as dt_util
 from homeassistant.components.device_tracker import PLATFORM_SCHEMA
 from homeassistant.components.device_tracker.const import (
@@ -25,42 +23,24 @@ from homeassistant.const import (
     STATE_HOME,
     STATE_NOT_HOME,
 )
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import callback
+from homeassistant.helpers.event import (
+    async_track_state_change,
+    async_track_time_interval,
+)
 from homeassistant.util import slugify
 from homeassistant.components import zone
 
+from .data_manager import get_sensor_data
 
 DEPENDENCIES = ["hue"]
 
 _LOGGER = logging.getLogger(__name__)
 
-TYPE_GEOFENCE = "Geofence"
+# Unchanged geofences are seen again this often, or they would go stale.
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
 
 
-def get_bridges(hass):
-    from homeassistant.components import hue
-    from homeassistant.components.hue.bridge import HueBridge
-
-    return [
-        entry
-        for entry in hass.data[hue.DOMAIN].values()
-        if isinstance(entry, HueBridge) and entry.api
-    ]
-
-
-async def update_api(api):
-    import aiohue
-
-    try:
-        with async_timeout.timeout(10):
-            await api.update()
-    except (asyncio.TimeoutError, aiohue.AiohueException) as err:
-        _LOGGER.debug("Failed to fetch sensors: %s", err)
-        return False
-    return True
-
-
 async def async_setup_scanner(hass, config, async_see, discovery_info=None):
     interval = config.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
     scanner = HueDeviceScanner(hass, async_see)
@@ -73,42 +53,71 @@ class HueDeviceScanner(DeviceScanner):
         """Initialize the scanner."""
         self.hass = hass
         self.async_see = async_see
+        self._data = None
+        self._seen = {}
+        self._home_gps = None
 
     async def async_start(self, hass, interval):
-        """Perform a first update and start polling at the given interval."""
-        await self.async_update_info()
+        """Report the geofences now and whenever the shared poller got them."""
+        self._data = get_sensor_data(hass)
+        self._data.async_add_tracker(interval)
+        await self._data.async_start()
+        async_track_state_change(hass, zone.ENTITY_ID_HOME, self._async_zone_changed)
+        self._data.async_add_listener(self.async_update_info)
+        self.async_update_info()
         interval = max(interval, DEFAULT_SCAN_INTERVAL)
-        async_track_time_interval(hass, self.async_update_info, interval)
+        async_track_time_interval(hass, self._async_see_all, interval)
+
+    @callback
+    def _async_see_all(self, now):
+        """See all geofences again, changed or not, unless the loop lags."""
+        if self._data.shedding:
+            return
+        self._seen.clear()
+        self.async_update_info()
+
+    @callback
+    def _async_zone_changed(self, entity_id, old_state, new_state):
+        """Forget the location of the home zone after it changed."""
+        self._home_gps = None
+
+    def _home_location(self):
+        """Return the GPS coordinates of the home zone, or None."""
+        if self._home_gps is None:
+            zone_home = self.hass.states.get(zone.ENTITY_ID_HOME)
+            if zone_home:
+                self._home_gps = [
+                    zone_home.attributes[ATTR_LATITUDE],
+                    zone_home.attributes[ATTR_LONGITUDE],
+                ]
+        return self._home_gps
 
     async def async_see_sensor(self, sensor):
-        last_updated = sensor.state.get("lastupdated")
+        last_updated = sensor["state"].get("lastupdated")
         if not last_updated or last_updated == "none":
             return
 
         kwargs = {
-            "dev_id": slugify("hue_{}".format(sensor.name)),
-            "host_name": sensor.name,
+            "dev_id": slugify("hue_{}".format(sensor["name"])),
+            "host_name": sensor["name"],
             "attributes": {
                 "last_updated": dt_util.as_local(dt_util.parse_datetime(last_updated)),
-                "unique_id": sensor.uniqueid,
+                "unique_id": sensor.get("uniqueid"),
             },
         }
 
-        if sensor.state.get("presence"):
+        if sensor["state"].get("presence"):
             kwargs["location_name"] = STATE_HOME
-            zone_home = self.hass.states.get(zone.ENTITY_ID_HOME)
-            if zone_home:
-                kwargs["gps"] = [
-                    zone_home.attributes[ATTR_LATITUDE],
-                    zone_home.attributes[ATTR_LONGITUDE],
-                ]
+            home_gps = self._home_location()
+            if home_gps:
+                kwargs["gps"] = home_gps
                 kwargs[ATTR_GPS_ACCURACY] = 0
         else:
             kwargs["location_name"] = STATE_NOT_HOME
 
         _LOGGER.debug(
             "Hue Geofence %s: %s (%s)",
-            sensor.name,
+            sensor["name"],
             kwargs["location_name"],
             kwargs["attributes"],
         )
@@ -116,20 +125,18 @@ class HueDeviceScanner(DeviceScanner):
         result = await self.async_see(**kwargs)
         return result
 
-    async def async_update_info(self, now=None):
-        """Get the bridge info."""
-        bridges = get_bridges(self.hass)
-        if not bridges:
-            return
-        await asyncio.wait(
-            [update_api(bridge.api.sensors) for bridge in bridges], loop=self.hass.loop
-        )
-        sensors = [
-            self.async_see_sensor(sensor)
-            for bridge in bridges
-            for sensor in bridge.api.sensors.values()
-            if sensor.type == TYPE_GEOFENCE
-        ]
-        if not sensors:
-            return
-        await asyncio.wait(sensors)
+    @callback
+    def async_update_info(self):
+        """Report the geofences whose presence changed since last seen.
+
+        The raw geofences are kept fresh by the shared poller, which calls
+        this after each poll.
+        """
+        for geofences in self._data.geofences.values():
+            for sensor in geofences.values():
+                state = sensor["state"]
+                seen = (state.get("presence"), state.get("lastupdated"))
+                if self._seen.get(sensor.get("uniqueid")) == seen:
+                    continue
+                self._seen[sensor.get("uniqueid")] = seen
+                self.hass.async_create_task(self.async_see_sensor(sensor))
@@ -0,0 +1,188 @@
+"""Push updates from the Hue v2 event stream.
+
+The bridge pushes per resource deltas in the CLIP v2 format. They are
+translated back onto the v1 /sensors resources they belong to (`id_v1`) so
+that the same parsers handle polled and pushed data.
+"""
+import asyncio
+import json
+import logging
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 10
+ID_V1_PREFIX = "/sensors/"
+BUTTON_EVENTS = {
+    "initial_press": 0,
+    "repeat": 1,
+    "short_release": 2,
+    "long_release": 3,
+}
+# Remotes whose v1 buttonevent is control_id * 1000 + the code above.
+THOUSANDS_MODELS = ("RWL", "ROM", "RDM")
+
+
+def parse_event_stream(lines):
+    """Yield the data of each server-sent event in an iterable of lines."""
+    data = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+
+
+def sensor_id(resource):
+    """Return the v1 sensor id a v2 resource belongs to, or None."""
+    id_v1 = resource.get("id_v1") or ""
+    if id_v1.startswith(ID_V1_PREFIX):
+        return id_v1[len(ID_V1_PREFIX) :]
+    return None
+
+
+def apply_resource(raw, resource, updated, control_ids):
+    """Apply a v2 resource delta to a copy of a v1 sensor.
+
+    Return the patched sensor, or None when the delta can not be expressed
+    in v1 terms and the sensor has to be polled instead.
+    """
+    state = dict(raw["state"])
+    config = dict(raw["config"])
+    rtype = resource.get("type")
+
+    if rtype == "motion" and "motion" in resource:
+        state["presence"] = resource["motion"]["motion"]
+    elif rtype == "temperature" and "temperature" in resource:
+        state["temperature"] = int(round(resource["temperature"]["temperature"] * 100))
+    elif rtype == "light_level" and "light" in resource:
+        lightlevel = resource["light"]["light_level"]
+        state["lightlevel"] = lightlevel
+        if "tholddark" in config:
+            state["dark"] = lightlevel <= config["tholddark"]
+            state["daylight"] = lightlevel >= config["tholddark"] + config.get(
+                "tholdoffset", 0
+            )
+    elif rtype == "button" and "button" in resource:
+        event = BUTTON_EVENTS.get(resource["button"].get("last_event"))
+        control_id = control_ids.get(resource.get("id"))
+        if (
+            event is None
+            or control_id is None
+            or raw["modelid"][0:3] not in THOUSANDS_MODELS
+        ):
+            return None
+        state["buttonevent"] = control_id * 1000 + event
+    elif rtype == "device_power" and "power_state" in resource:
+        config["battery"] = resource["power_state"].get("battery_level")
+        return dict(raw, state=state, config=config)
+    elif rtype == "zigbee_connectivity" and "status" in resource:
+        config["reachable"] = resource["status"] == "connected"
+        return dict(raw, state=state, config=config)
+    else:
+        return None
+
+    state["lastupdated"] = updated
+    return dict(raw, state=state, config=config)
+
+
+class HueEventStream(object):
+    """Long-lived connection to the event stream of one bridge."""
+
+    def __init__(self, session, base_url, username, on_resource, on_connected):
+        """Initialize the stream.
+
+        base_url is https://<bridge host> for a real bridge; any server
+        speaking the same protocol can stand in for it.
+        """
+        self.session = session
+        self.base_url = base_url
+        self.username = username
+        self.on_resource = on_resource
+        self.on_connected = on_connected
+        self.connected = False
+        self.control_ids = {}
+        self._task = None
+
+    @property
+    def headers(self):
+        """Return the headers authenticating against the v2 API."""
+        return {"hue-application-key": self.username}
+
+    def start(self, loop):
+        """Start following the stream in the background."""
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        """Stop following the stream."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """Follow the stream, reconnecting after failures."""
+        while True:
+            try:
+                await self._load_control_ids()
+                await self._follow()
+            except asyncio.CancelledError:
+                self._set_connected(False)
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                _LOGGER.debug("Event stream of %s failed: %s", self.base_url, err)
+            self._set_connected(False)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _load_control_ids(self):
+        """Map v2 button ids to the button numbers used in v1 events."""
+        async with self.session.get(
+            self.base_url + "/clip/v2/resource/button",
+            headers=self.headers,
+            ssl=False,
+        ) as resp:
+            resp.raise_for_status()
+            body = await resp.json(content_type=None)
+        self.control_ids = {
+            button["id"]: button["metadata"]["control_id"]
+            for button in body.get("data", [])
+        }
+
+    async def _follow(self):
+        """Read events until the bridge closes the stream."""
+        headers = dict(self.headers, Accept="text/event-stream")
+        async with self.session.get(
+            self.base_url + "/eventstream/clip/v2",
+            headers=headers,
+            ssl=False,
+            timeout=aiohttp.ClientTimeout(total=None),
+        ) as resp:
+            resp.raise_for_status()
+            self._set_connected(True)
+            lines = []
+            async for line in resp.content:
+                lines.append(line.decode("utf-8"))
+                if line.strip():
+                    continue
+                for data in parse_event_stream(lines):
+                    self._dispatch(json.loads(data))
+                lines = []
+
+    def _dispatch(self, events):
+        """Hand the updated resources of a batch of events to the callback."""
+        for event in events:
+            if event.get("type") != "update":
+                continue
+            updated = event.get("creationtime", "").rstrip("Z")
+            for resource in event.get("data", []):
+                self.on_resource(resource, updated)
+
+    def _set_connected(self, connected):
+        """Track the connection state and report changes."""
+        if connected != self.connected:
+            self.connected = connected
+            self.on_connected(connected)
@@ -0,0 +1,200 @@
+"""Recognise double clicks, long presses and click sequences of remotes."""
+from array import array
+
+# Presses kept per remote.
+HISTORY_SIZE = 8
+# Seconds between the clicks of a double click.
+DOUBLE_CLICK_WINDOW = 1.0
+# Seconds from the first to the last click of a sequence.
+SEQUENCE_WINDOW = 5.0
+# Seconds a Friends of Hue button is held for a long press.
+LONG_PRESS = 1.0
+
+DOUBLE_CLICK = "double_click"
+LONG_PRESS_GESTURE = "long_press"
+SEQUENCE = "sequence"
+
+# Kinds of button events.
+PRESS = "press"
+CLICK = "click"
+HOLD = "hold"
+RELEASE = "release"
+
+RWL_SUFFIXES = (
+    ("_click_up", CLICK),
+    ("_hold_up", RELEASE),
+    ("_click", PRESS),
+    ("_hold", HOLD),
+)
+FOH_SUFFIXES = (("_press", PRESS), ("_release", RELEASE))
+ZGP_SUFFIXES = (("_click", CLICK),)
+SUFFIXES = {"RWL": RWL_SUFFIXES, "FOH": FOH_SUFFIXES, "ZGP": ZGP_SUFFIXES}
+
+
+def classify(model, event):
+    """Return the button and kind of a button event, or None."""
+    if not isinstance(event, str):
+        return None
+    for suffix, kind in SUFFIXES.get(model, ()):
+        if event.endswith(suffix):
+            return event[: -len(suffix)], kind
+    return None
+
+
+class ButtonHistory(object):
+    """Ring buffer of the last presses of a remote.
+
+    The events are kept in a list and the times in an array of doubles,
+    both allocated once. Positions count every press ever added, so they
+    still tell the order after the buffer wrapped around.
+    """
+
+    def __init__(self, size=HISTORY_SIZE):
+        """Initialize an empty history."""
+        self.events = [None] * size
+        self.times = array("d", [0.0] * size)
+        self.size = size
+        self.end = 0
+
+    def append(self, event, when):
+        """Add a button event seen at monotonic time when."""
+        slot = self.end % self.size
+        self.events[slot] = event
+        self.times[slot] = when
+        self.end += 1
+
+    def __getitem__(self, position):
+        """Return the event and time of a position still in the buffer."""
+        slot = position % self.size
+        return self.events[slot], self.times[slot]
+
+    @property
+    def start(self):
+        """Return the position of the oldest press still in the buffer."""
+        return max(0, self.end - self.size)
+
+    def previous(self):
+        """Return the event and time before the last one, or None."""
+        if self.end - 1 <= self.start:
+            return None
+        return self[self.end - 2]
+
+
+class GestureEngine(object):
+    """Turn the presses of remotes into gestures.
+
+    The bridge only reports the last button event of a remote, with a
+    lastupdated of one second resolution, so presses are timed when they
+    are seen. A gesture uses up its clicks: a triple click is one double
+    click, not two.
+    """
+
+    def __init__(self):
+        """Initialize without sequences."""
+        self.sequences = {}
+        self._histories = {}
+        # Position from which clicks count, per remote, for doubles and sequences.
+        self._double_from = {}
+        self._sequence_from = {}
+
+    def configure(self, sequences):
+        """Add named sequences of buttons to recognise."""
+        self.sequences.update(
+            (name, [str(button) for button in buttons])
+            for name, buttons in sequences.items()
+        )
+
+    def forget(self, key):
+        """Drop the history of a remote."""
+        self._histories.pop(key, None)
+        self._double_from.pop(key, None)
+        self._sequence_from.pop(key, None)
+
+    def pressed(self, key, model, event, now):
+        """Add a press of a remote, return its gestures as (gesture, button, name).
+
+        name is the name of a sequence, None for the other gestures.
+        """
+        classified = classify(model, event)
+        if classified is None:
+            return []
+        history = self._histories.get(key)
+        if history is None:
+            history = self._histories[key] = ButtonHistory()
+        history.append(event, now)
+        button, kind = classified
+
+        if kind in (HOLD, RELEASE) and self._long_press(history, model, button, now):
+            return [(LONG_PRESS_GESTURE, button, None)]
+        if self._click(history, model, history.end - 1) is None:
+            return []
+
+        gestures = []
+        clicks = self._clicks(history, model, self._sequence_from.get(key, 0))
+        for name, buttons in self.sequences.items():
+            if len(clicks) < len(buttons):
+                continue
+            recent = clicks[-len(buttons) :]
+            if [click[0] for click in recent] == buttons and (
+                now - recent[0][1] <= SEQUENCE_WINDOW
+            ):
+                gestures.append((SEQUENCE, button, name))
+                self._sequence_from[key] = history.end
+        clicks = self._clicks(history, model, self._double_from.get(key, 0))
+        if (
+            len(clicks) >= 2
+            and clicks[-2][0] == button
+            and now - clicks[-2][1] <= DOUBLE_CLICK_WINDOW
+        ):
+            gestures.append((DOUBLE_CLICK, button, None))
+            self._double_from[key] = history.end
+        return gestures
+
+    def _long_press(self, history, model, button, now):
+        """Return True if the last event ends or holds a long press of button.
+
+        A dimmer switch reports the hold itself, repeatedly while the button
+        is held; only the first one counts. A Friends of Hue switch only
+        reports press and release, the time between them tells.
+        """
+        previous = history.previous()
+        if model == "FOH":
+            return (
+                previous is not None
+                and classify(model, previous[0]) == (button, PRESS)
+                and now - previous[1] >= LONG_PRESS
+            )
+        return previous is None or classify(model, previous[0]) != (button, HOLD)
+
+    def _click(self, history, model, position):
+        """Return the button clicked by the event at position, or None.
+
+        A Friends of Hue release is a click unless its press was long ago;
+        a release without a press seen is a click too.
+        """
+        event, when = history[position]
+        classified = classify(model, event)
+        if classified is None:
+            return None
+        button, kind = classified
+        if kind == CLICK:
+            return button
+        if model != "FOH" or kind != RELEASE:
+            return None
+        if position > history.start:
+            previous, pressed = history[position - 1]
+            if (
+                classify(model, previous) == (button, PRESS)
+                and when - pressed >= LONG_PRESS
+            ):
+                return None
+        return button
+
+    def _clicks(self, history, model, since):
+        """Return the (button, time) of the clicks in the history from since."""
+        clicks = []
+        for position in range(max(since, history.start), history.end):
+            button = self._click(history, model, position)
+            if button is not None:
+                clicks.append((button, history[position][1]))
+        return clicks
@@ -0,0 +1,50 @@
+"""Keep the requests to a Hue bridge within a share of what it can take."""
+
+# Requests per second a bridge handles before it drops or slows them.
+BRIDGE_BUDGET = 10
+# Share of the budget taken by default, the rest is left to the hue
+# integration controlling the lights.
+DEFAULT_SHARE = 0.5
+# Seconds worth of requests the bucket holds, for the burst after a press.
+BURST_SECONDS = 1.0
+# Share of the bucket only button and motion fetches may take.
+RESERVED = 0.5
+
+
+class RequestGovernor(object):
+    """Token bucket for the requests sent to one bridge.
+
+    Tokens come in at rate per second, up to BURST_SECONDS worth of them.
+    Button and motion fetches may empty the bucket; reconciliation and
+    probes leave the RESERVED share to them.
+    """
+
+    def __init__(self, rate):
+        """Initialize with a full bucket and the rate in requests per second."""
+        self.rate = rate
+        self.tokens = self.capacity
+        self.updated = None
+
+    @property
+    def capacity(self):
+        """Return the number of tokens the bucket holds."""
+        return max(self.rate * BURST_SECONDS, 1)
+
+    def acquire(self, requests, now, priority):
+        """Take the tokens for a fetch of some requests at loop time now.
+
+        Return 0 if the fetch may go ahead, otherwise the seconds until it
+        may, and take nothing.
+        """
+        capacity = self.capacity
+        if self.updated is not None:
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if priority:
+            needed = min(requests, capacity)
+        else:
+            needed = min(requests + capacity * RESERVED, capacity)
+        if self.tokens < needed:
+            return (needed - self.tokens) / self.rate
+        self.tokens -= requests
+        return 0
@@ -0,0 +1,253 @@
+"""Parsers for the Hue API /sensors response."""
+from collections import namedtuple
+
+from homeassistant.const import STATE_ON, STATE_OFF
+
+from .records import FOHRecord, RWLRecord, SMLRecord, ZGPRecord, parse_lastupdated
+
+# A parser of one resource type of a model. key builds the key of the record
+# a resource belongs to, parse turns the resource into that record. Shared
+# records are built from several resources and are passed to parse to fill.
+ModelParser = namedtuple("ModelParser", ["key", "parse", "shared"])
+
+MODEL_PARSERS = {}  # (modelid prefix, resource type) -> ModelParser
+
+TAP_BUTTONS = {34: "1_click", 16: "2_click", 17: "3_click", 18: "4_click"}
+FOH_BUTTONS = {
+    16: "left_upper_press",
+    20: "left_upper_release",
+    17: "left_lower_press",
+    21: "left_lower_release",
+    18: "right_lower_press",
+    22: "right_lower_release",
+    19: "right_upper_press",
+    23: "right_upper_release",
+    100: "double_upper_press",
+    101: "double_upper_release",
+    98: "double_lower_press",
+    99: "double_lower_release",
+}
+# I know it should be _released not _up
+# but _hold_up is too good to miss isn't it
+RWL_RESPONSECODES = {"0": "_click", "1": "_hold", "2": "_click_up", "3": "_hold_up"}
+
+
+def register_model(modelid, resource_type, key, parse, shared=False):
+    """Register the parser of a resource type of a model."""
+    MODEL_PARSERS[(modelid, resource_type)] = ModelParser(key, parse, shared)
+
+
+def device_key(modelid):
+    """Return a key builder for records keyed on the device of the uniqueid."""
+    prefix = modelid + "_"
+
+    def build_key(sensor):
+        return prefix + sensor["uniqueid"][:-5]
+
+    return build_key
+
+
+def endpoint_key(modelid):
+    """Return a key builder for records keyed on the end of the uniqueid."""
+    prefix = modelid + "_"
+
+    def build_key(sensor):
+        return prefix + sensor["uniqueid"][-5:]  ###needed for uniqueness
+
+    return build_key
+
+
+def get_parser(sensor):
+    """Return the ModelParser of a raw sensor, or None if not supported."""
+    return MODEL_PARSERS.get((sensor["modelid"][0:3], sensor["type"]))
+
+
+def sensor_key(sensor):
+    """Return the key of the record a raw sensor belongs to, or None."""
+    parser = get_parser(sensor)
+    if parser is not None:
+        return parser.key(sensor)
+    return None
+
+
+def parse_sensor(data_dict, parser, key, sensor):
+    """Parse a raw sensor into its record in data_dict."""
+    if parser.shared:
+        data_dict[key] = parser.parse(sensor, data_dict.get(key))
+    else:
+        data_dict[key] = parser.parse(sensor)
+
+
+def parse_hue_api_response(sensors):
+    """Take in the Hue API json response."""
+    data_dict = {}  # The list of sensors, referenced by their hue_id.
+
+    # Loop over all keys (1,2 etc) to identify sensors and get data.
+    for sensor in sensors:
+        parser = get_parser(sensor)
+        if parser is not None:
+            parse_sensor(data_dict, parser, parser.key(sensor), sensor)
+
+    return data_dict
+
+
+class IncrementalParser(object):
+    """Parse only the sensors that moved since the previous response.
+
+    Each raw sensor is remembered by uniqueid together with its state,
+    config and name. A record is only parsed again when one of the
+    resources it is built from differs from what was seen before.
+    """
+
+    def __init__(self):
+        """Initialize the parser."""
+        self._seen = {}
+
+    def parse(self, sensors):
+        """Return the records of the sensors that changed."""
+        seen = self._seen
+        resources = {}
+        changed = set()
+
+        for sensor in sensors:
+            uniqueid = sensor.get("uniqueid")
+            fingerprint = (sensor["state"], sensor["config"], sensor["name"])
+            entry = seen.get(uniqueid)
+            if entry is not None and entry[2] == fingerprint:
+                key, parser = entry[0], entry[1]
+            else:
+                parser = get_parser(sensor)
+                key = parser.key(sensor) if parser is not None else None
+                if uniqueid is not None:
+                    # Copies, in case the client updates the raw dicts in place.
+                    seen[uniqueid] = (
+                        key,
+                        parser,
+                        (dict(sensor["state"]), dict(sensor["config"]), sensor["name"]),
+                    )
+                if key is not None:
+                    changed.add(key)
+            if key is not None:
+                resources.setdefault(key, []).append((parser, sensor))
+
+        data_dict = {}
+        for key in changed:
+            for parser, sensor in resources[key]:
+                parse_sensor(data_dict, parser, key, sensor)
+        return data_dict
+
+    def forget(self, key):
+        """Parse the resources of the record of key again on the next call."""
+        for uniqueid in [
+            uniqueid for uniqueid, entry in self._seen.items() if entry[0] == key
+        ]:
+            del self._seen[uniqueid]
+
+    def forget_resources(self, uniqueids):
+        """Drop the raw sensors of the given uniqueids, gone from the bridge."""
+        for uniqueid in uniqueids:
+            self._seen.pop(uniqueid, None)
+
+
+def parse_sml(response, record=None):
+    """Parse the json for a SML Hue motion sensor into its record.
+
+    The record is shared by the presence, light level and temperature
+    resources of the sensor, each of them fills in its own fields.
+    """
+    if record is None:
+        record = SMLRecord()
+
+    if response["type"] == "ZLLLightLevel":
+        lightlevel = response["state"].get("lightlevel")
+        record.threshold = response["config"].get("tholddark")
+        if lightlevel is not None:
+            record.light_level = lightlevel
+            record.lx = round(float(10 ** ((lightlevel - 1) / 10000)), 2)
+            record.dark = response["state"]["dark"]
+            record.daylight = response["state"]["daylight"]
+        else:
+            record.light_level = "No light level data"
+            record.lx = None
+            record.dark = None
+            record.daylight = None
+
+    elif response["type"] == "ZLLTemperature":
+        if response["state"]["temperature"] is not None:
+            record.temperature = response["state"]["temperature"] / 100.0
+        else:
+            record.temperature = "No temperature data"
+
+    elif response["type"] == "ZLLPresence":
+        name_raw = response["name"]
+        arr = name_raw.split()
+        arr.insert(-1, "motion")
+        record.name = " ".join(arr)
+        hue_state = response["state"]["presence"]
+        if hue_state is True:
+            record.state = STATE_ON
+        else:
+            record.state = STATE_OFF
+
+        record.battery = response["config"]["battery"]
+        record.on = response["config"]["on"]
+        record.reachable = response["config"]["reachable"]
+        record.sensitivity = response["config"]["sensitivity"]
+        record.last_updated = parse_lastupdated(response["state"]["lastupdated"])
+    return record
+
+
+def parse_zgp(response):
+    """Parse the json response for a ZGPSWITCH Hue Tap."""
+    press = response["state"]["buttonevent"]
+    if press is None or press not in TAP_BUTTONS:
+        button = "No data"
+    else:
+        button = TAP_BUTTONS[press]
+
+    return ZGPRecord(
+        name=response["name"],
+        state=button,
+        last_updated=parse_lastupdated(response["state"]["lastupdated"]),
+    )
+
+
+def parse_rwl(response):
+    """Parse the json response for a RWL Hue remote."""
+    button = None
+    if response["state"]["buttonevent"]:
+        press = str(response["state"]["buttonevent"])
+        button = press[0] + RWL_RESPONSECODES[press[-1]]
+
+    return RWLRecord(
+        name=response["name"],
+        state=button,
+        battery=response["config"]["battery"],
+        on=response["config"]["on"],
+        reachable=response["config"]["reachable"],
+        last_updated=parse_lastupdated(response["state"]["lastupdated"]),
+    )
+
+
+def parse_foh(response):
+    """Parse the JSON response for a FOHSWITCH (type still = ZGPSwitch)"""
+    press = response["state"]["buttonevent"]
+    if press is None or press not in FOH_BUTTONS:
+        button = "No data"
+    else:
+        button = FOH_BUTTONS[press]
+
+    return FOHRecord(
+        name=response["name"],
+        state=button,
+        last_updated=parse_lastupdated(response["state"]["lastupdated"]),
+    )
+
+
+register_model("RWL", "ZLLSwitch", device_key("RWL"), parse_rwl)
+register_model("ROM", "ZLLSwitch", device_key("ROM"), parse_rwl)
+register_model("RDM", "ZLLSwitch", device_key("RDM"), parse_rwl)
+register_model("ZGP", "ZGPSwitch", device_key("ZGP"), parse_zgp)
+register_model("FOH", "ZGPSwitch", endpoint_key("FOH"), parse_foh)
+for _type in ("ZLLPresence", "ZLLLightLevel", "ZLLTemperature"):
+    register_model("SML", _type, device_key("SML"), parse_sml, shared=True)
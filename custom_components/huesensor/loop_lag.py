@@ -0,0 +1,54 @@
+"""Watch the lag of the event loop, to shed work while it is overloaded."""
+
+# Seconds between two measurements of the lag.
+PROBE_INTERVAL = 0.5
+# Smoothed lag in seconds above which work is shed, and below which the
+# shedding stops again.
+SHED_ABOVE = 0.2
+RESUME_BELOW = 0.05
+# Weight of a new measurement in the smoothed lag.
+SMOOTHING = 0.3
+
+
+class LoopLagMonitor(object):
+    """Measure how late the event loop runs a timer.
+
+    A probe is scheduled PROBE_INTERVAL ahead, how much later it runs is
+    the lag. on_change is called with True once the smoothed lag went over
+    SHED_ABOVE, and with False once it went back under RESUME_BELOW.
+    """
+
+    def __init__(self, loop, on_change):
+        """Initialize the monitor, not shedding."""
+        self.loop = loop
+        self.on_change = on_change
+        self.lag = 0.0
+        self.shedding = False
+        self._handle = None
+
+    def start(self):
+        """Start measuring."""
+        if self._handle is None:
+            self._schedule()
+
+    def stop(self):
+        """Stop measuring."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        expected = self.loop.time() + PROBE_INTERVAL
+        self._handle = self.loop.call_at(expected, self._probe, expected)
+
+    def _probe(self, expected):
+        """Take in the lag of a probe and schedule the next one."""
+        self.lag += SMOOTHING * (max(0.0, self.loop.time() - expected) - self.lag)
+        if self.shedding:
+            changed = self.lag < RESUME_BELOW
+        else:
+            changed = self.lag > SHED_ABOVE
+        if changed:
+            self.shedding = not self.shedding
+            self.on_change(self.shedding)
+        self._schedule()
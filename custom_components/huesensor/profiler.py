@@ -0,0 +1,93 @@
+"""On demand profiling of the polling of the Hue bridges."""
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+
+import homeassistant.util.dt as dt_util
+import voluptuous as vol
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE = "profile"
+ATTR_SECONDS = "seconds"
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SECONDS, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        )
+    }
+)
+# Functions listed in the report, by cumulative time.
+REPORT_FUNCTIONS = 40
+
+
+class PhaseTimer(object):
+    """Add up the time spent in each phase of the polling."""
+
+    def __init__(self):
+        """Initialize the timer."""
+        self.totals = {}
+        self.counts = {}
+
+    def lap(self, phase, since):
+        """Add the time since a perf_counter mark to a phase, return a new mark."""
+        now = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0) + now - since
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        return now
+
+    def report(self):
+        """Return the phases as lines of text, slowest first."""
+        lines = [
+            "{:<8} {:>8} {:>12} {:>10}".format("phase", "count", "total ms", "mean ms")
+        ]
+        for phase, total in sorted(
+            self.totals.items(), key=lambda item: item[1], reverse=True
+        ):
+            count = self.counts[phase]
+            lines.append(
+                "{:<8} {:>8} {:>12.1f} {:>10.3f}".format(
+                    phase, count, 1000 * total, 1000 * total / count
+                )
+            )
+        return lines
+
+
+def write_profile(profile, phases, path):
+    """Write the stats of a profile, and a report with the phases next to it."""
+    profile.dump_stats(path + ".prof")
+    stats = io.StringIO()
+    pstats.Stats(profile, stream=stats).sort_stats("cumulative").print_stats(
+        REPORT_FUNCTIONS
+    )
+    with open(path + ".txt", "w") as report:
+        report.write("\n".join(phases.report()))
+        report.write("\n\n")
+        report.write(stats.getvalue())
+
+
+async def async_profile(hass, data, seconds):
+    """Profile the event loop and time the polling phases for some seconds.
+
+    The profile covers everything running on the event loop meanwhile,
+    the phase timings only the polling of the Hue bridges.
+    """
+    if data.phases is not None:
+        _LOGGER.warning("A huesensor profile is already being recorded")
+        return
+    path = hass.config.path(
+        "huesensor_profile_{}".format(dt_util.utcnow().strftime("%Y%m%d%H%M%S"))
+    )
+    profile = cProfile.Profile()
+    data.phases = PhaseTimer()
+    profile.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile.disable()
+        phases, data.phases = data.phases, None
+    await hass.async_add_executor_job(write_profile, profile, phases, path)
+    _LOGGER.info("Wrote huesensor profile to %s.prof and %s.txt", path, path)
@@ -0,0 +1,71 @@
+"""Fetch the /sensors list of a bridge without building aiohue objects.
+
+aiohue turns every resource into an object, only for the poller to take
+the raw dicts out again. This client does the GET itself, decodes the body
+with orjson or msgspec when one of them is installed, and keeps only the
+resources the parsers and the device tracker use.
+"""
+import json
+
+from .const import TYPE_GEOFENCE
+from .hue_api_response import MODEL_PARSERS
+
+try:
+    import orjson
+
+    loads = orjson.loads
+    DecodeError = ValueError
+except ImportError:
+    try:
+        import msgspec
+
+        loads = msgspec.json.decode
+        DecodeError = msgspec.DecodeError
+    except ImportError:
+        loads = json.loads
+        DecodeError = ValueError
+
+
+def is_supported(sensor):
+    """Return True if a raw sensor is parsed or tracked, False if ignored."""
+    return sensor.get("type") == TYPE_GEOFENCE or (
+        (sensor.get("modelid", "")[0:3], sensor.get("type")) in MODEL_PARSERS
+    )
+
+
+def supported_sensors(sensors):
+    """Return the supported sensors of a decoded /sensors body by id.
+
+    Hue reports errors as a list with a 200 status, they raise ValueError.
+    """
+    if not isinstance(sensors, dict):
+        raise ValueError("Unexpected /sensors response: {}".format(sensors))
+    return {
+        sensor_id: sensor
+        for sensor_id, sensor in sensors.items()
+        if is_supported(sensor)
+    }
+
+
+class RawSensorsClient(object):
+    """GET the /sensors list of one bridge on a keep-alive session."""
+
+    def __init__(self, session, host, username):
+        """Initialize the client.
+
+        The session is shared and keeps its connections alive, so the polls
+        of a bridge reuse one connection instead of opening one per tick.
+        """
+        self.session = session
+        self.url = "http://{}/api/{}/sensors".format(host, username)
+
+    async def fetch(self):
+        """Return the supported raw sensors of the bridge by id."""
+        async with self.session.get(self.url) as resp:
+            resp.raise_for_status()
+            body = await resp.read()
+        try:
+            sensors = loads(body)
+        except DecodeError as err:
+            raise ValueError(str(err))
+        return supported_sensors(sensors)
@@ -0,0 +1,132 @@
+"""Compact records holding the parsed state of the Hue sensors."""
+import homeassistant.util.dt as dt_util
+
+
+def parse_lastupdated(lastupdated):
+    """Parse the lastupdated of a Hue sensor, in UTC, or None if never set."""
+    if not lastupdated or lastupdated == "none":
+        return None
+    parsed = dt_util.parse_datetime(lastupdated)
+    if parsed is None:
+        return None
+    return parsed.replace(tzinfo=dt_util.UTC)
+
+
+def format_lastupdated(last_updated):
+    """Format a timestamp the way the last_updated attribute always showed it."""
+    if last_updated is None:
+        return ["none"]
+    return [last_updated.strftime("%Y-%m-%d"), last_updated.strftime("%H:%M:%S")]
+
+
+class SensorRecord(object):
+    """Parsed state of a Hue sensor device.
+
+    Records live as long as their sensor: fresh parses are merged into them
+    with update_from, so entities can keep a reference to their record.
+    """
+
+    __slots__ = ("name", "state", "last_updated", "changed", "_attributes")
+
+    model = None
+    button = False
+    FIELDS = ("name", "state", "last_updated")
+    ATTRS = ("last_updated",)
+
+    def __init__(self, **fields):
+        """Initialize the record from keyword fields."""
+        self.changed = True
+        self._attributes = None
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @property
+    def attributes(self):
+        """Return the state attributes, rebuilt only after one changed."""
+        if self._attributes is None:
+            attributes = {key: getattr(self, key) for key in self.ATTRS}
+            attributes["last_updated"] = format_lastupdated(self.last_updated)
+            self._attributes = attributes
+        return self._attributes
+
+    def update_from(self, new):
+        """Take over the fields of a newer parse of the same sensor.
+
+        Return True if the record changed. The changed flag is cleared when
+        only the attributes moved, not the state or its timestamp.
+        """
+        moved = self.last_updated != new.last_updated or self.state != new.state
+        dirty = False
+        for field in self.FIELDS:
+            value = getattr(new, field)
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                dirty = True
+                if field in self.ATTRS:
+                    self._attributes = None
+        if not dirty:
+            return False
+        self.changed = moved
+        return True
+
+
+class RWLRecord(SensorRecord):
+    """Hue dimmer switch, also used for the ROM smart button."""
+
+    __slots__ = ("battery", "on", "reachable")
+
+    model = "RWL"
+    button = True
+    FIELDS = SensorRecord.FIELDS + __slots__
+    ATTRS = ("last_updated", "battery", "on", "reachable")
+
+
+class ZGPRecord(SensorRecord):
+    """Hue tap switch."""
+
+    __slots__ = ()
+
+    model = "ZGP"
+    button = True
+
+
+class FOHRecord(SensorRecord):
+    """Friends of Hue switch."""
+
+    __slots__ = ()
+
+    model = "FOH"
+    button = True
+
+
+class SMLRecord(SensorRecord):
+    """Hue motion sensor, built from its presence, light and temperature."""
+
+    __slots__ = (
+        "battery",
+        "on",
+        "reachable",
+        "sensitivity",
+        "light_level",
+        "lx",
+        "dark",
+        "daylight",
+        "threshold",
+        "temperature",
+    )
+
+    model = "SML"
+    FIELDS = SensorRecord.FIELDS + __slots__
+    ATTRS = (
+        "light_level",
+        "battery",
+        "last_updated",
+        "lx",
+        "dark",
+        "daylight",
+        "temperature",
+        "on",
+        "reachable",
+        "sensitivity",
+        "threshold",
+    )
@@ -0,0 +1,56 @@
+"""Activity driven poll cadence for a Hue bridge."""
+
+# Keep polling at the fast cadence this long after the last activity.
+ACTIVE_HOLD = 5.0
+# Factor the interval grows by on each idle poll after the hold.
+BACKOFF_FACTOR = 1.5
+
+
+class PollScheduler(object):
+    """Decide when a bridge is due for its next poll.
+
+    Any button event or motion change snaps the interval back to the fast
+    cadence. Once the bridge has been quiet for ACTIVE_HOLD seconds the
+    interval grows on each poll until it reaches the slow cadence.
+    """
+
+    def __init__(self, fast, slow):
+        """Initialize with the fast and slow intervals, in seconds."""
+        self.fast = fast
+        self.slow = max(slow, fast)
+        self.interval = fast
+        self.next_poll = 0
+        self.last_active = None
+
+    def due(self, now):
+        """Return True if the bridge should be polled at loop time now."""
+        return now >= self.next_poll
+
+    def polled(self, now, active):
+        """Record a poll started at now and plan the next one."""
+        if active:
+            self.last_active = now
+            self.interval = self.fast
+        elif self.last_active is None or now - self.last_active > ACTIVE_HOLD:
+            self.interval = min(self.interval * BACKOFF_FACTOR, self.slow)
+        self.next_poll = now + self.interval
+
+    def set_intervals(self, fast, slow):
+        """Change the fast and slow intervals.
+
+        A poll planned further out than the new slow interval allows is
+        brought forward to the next tick.
+        """
+        self.fast = fast
+        self.slow = max(slow, fast)
+        if self.interval > self.slow:
+            self.interval = self.fast
+            self.poll_now()
+
+    def defer(self, now, delay):
+        """Push the next poll at least delay seconds past now."""
+        self.next_poll = max(self.next_poll, now + delay)
+
+    def poll_now(self):
+        """Make the bridge due on the next tick."""
+        self.next_poll = 0
@@ -4,23 +4,33 @@ Sensor for checking the status of Hue sensors.
 For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/sensor.hue/
 """
-import asyncio
-import async_timeout
 import logging
-import threading
-from datetime import timedelta
+from functools import partial
 
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
 from homeassistant.components.sensor import PLATFORM_SCHEMA
+from homeassistant.const import (
+    DEVICE_CLASS_BATTERY,
+    DEVICE_CLASS_ILLUMINANCE,
+    DEVICE_CLASS_TEMPERATURE,
+    TEMP_CELSIUS,
+)
+from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.event import async_track_time_interval
+
+from .const import CONF_TELEMETRY, POLLING_SCHEMA
+from .data_manager import get_sensor_data
 
 DEPENDENCIES = ["hue"]
 
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=0.1)
-TYPE_GEOFENCE = "Geofence"
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(POLLING_SCHEMA).extend(
+    {vol.Optional(CONF_TELEMETRY, default=False): cv.boolean}
+)
+
 ICONS = {
     "SML": "mdi:run",
     "RWL": "mdi:remote",
@@ -29,218 +39,32 @@ ICONS = {
     "FOH": "mdi:light-switch",
 }
 DEVICE_CLASSES = {"SML": "motion"}
-ATTRS = {
-    "SML": [
-        "light_level",
-        "battery",
-        "last_updated",
-        "lx",
-        "dark",
-        "daylight",
+# Measurement -> (models, record field, name suffix, unit, device class)
+MEASUREMENTS = {
+    "temperature": (
+        ["SML"],
         "temperature",
-        "on",
-        "reachable",
-        "sensitivity",
-        "threshold",
-    ],
-    "RWL": ["last_updated", "battery", "on", "reachable"],
-    "ROM": ["last_updated", "battery", "on", "reachable"],
-    "ZGP": ["last_updated"],
-    "FOH": ["last_updated"],
+        "temperature",
+        TEMP_CELSIUS,
+        DEVICE_CLASS_TEMPERATURE,
+    ),
+    "light_level": (["SML"], "lx", "light level", "lx", DEVICE_CLASS_ILLUMINANCE),
+    "battery": (["SML", "RWL"], "battery", "battery", "%", DEVICE_CLASS_BATTERY),
 }
 
 
-def parse_hue_api_response(sensors):
-    """Take in the Hue API json response."""
-    data_dict = {}  # The list of sensors, referenced by their hue_id.
-
-    # Loop over all keys (1,2 etc) to identify sensors and get data.
-    for sensor in sensors:
-        modelid = sensor["modelid"][0:3]
-        if modelid in ["RWL", "ROM", "SML", "ZGP"]:
-            _key = modelid + "_" + sensor["uniqueid"][:-5]
-            if modelid == "RWL" or modelid == "ROM":
-                data_dict[_key] = parse_rwl(sensor)
-            elif modelid == "ZGP":
-                data_dict[_key] = parse_zgp(sensor)
-
-        elif modelid == "FOH":  ############# New Model ID
-            _key = modelid + "_" + sensor["uniqueid"][-5:]  ###needed for uniqueness
-            data_dict[_key] = parse_foh(sensor)
-
-    return data_dict
-
-
-def parse_zgp(response):
-    """Parse the json response for a ZGPSWITCH Hue Tap."""
-    TAP_BUTTONS = {34: "1_click", 16: "2_click", 17: "3_click", 18: "4_click"}
-    press = response["state"]["buttonevent"]
-    if press is None or press not in TAP_BUTTONS:
-        button = "No data"
-    else:
-        button = TAP_BUTTONS[press]
-
-    data = {
-        "model": "ZGP",
-        "name": response["name"],
-        "state": button,
-        "last_updated": response["state"]["lastupdated"].split("T"),
-    }
-    return data
-
-
-def parse_rwl(response):
-    """Parse the json response for a RWL Hue remote."""
-
-    """
-        I know it should be _released not _up
-        but _hold_up is too good to miss isn't it
-    """
-    responsecodes = {"0": "_click", "1": "_hold", "2": "_click_up", "3": "_hold_up"}
-
-    button = None
-    if response["state"]["buttonevent"]:
-        press = str(response["state"]["buttonevent"])
-        button = str(press)[0] + responsecodes[press[-1]]
-
-    data = {
-        "model": "RWL",
-        "name": response["name"],
-        "state": button,
-        "battery": response["config"]["battery"],
-        "on": response["config"]["on"],
-        "reachable": response["config"]["reachable"],
-        "last_updated": response["state"]["lastupdated"].split("T"),
-    }
-    return data
-
-
-def parse_foh(response):
-    """Parse the JSON response for a FOHSWITCH (type still = ZGPSwitch)"""
-    FOH_BUTTONS = {
-        16: "left_upper_press",
-        20: "left_upper_release",
-        17: "left_lower_press",
-        21: "left_lower_release",
-        18: "right_lower_press",
-        22: "right_lower_release",
-        19: "right_upper_press",
-        23: "right_upper_release",
-        100: "double_upper_press",
-        101: "double_upper_release",
-        98: "double_lower_press",
-        99: "double_lower_release",
-    }
-
-    press = response["state"]["buttonevent"]
-    if press is None or press not in FOH_BUTTONS:
-        button = "No data"
-    else:
-        button = FOH_BUTTONS[press]
-
-    data = {
-        "model": "FOH",
-        "name": response["name"],
-        "state": button,
-        "last_updated": response["state"]["lastupdated"].split("T"),
-    }
-    return data
-
-
-def get_bridges(hass):
-    from homeassistant.components import hue
-    from homeassistant.components.hue.bridge import HueBridge
-
-    return [
-        entry
-        for entry in hass.data[hue.DOMAIN].values()
-        if isinstance(entry, HueBridge) and entry.api
-    ]
-
-
-async def update_api(api):
-    import aiohue
-
-    try:
-        with async_timeout.timeout(10):
-            await api.update()
-    except (asyncio.TimeoutError, aiohue.AiohueException) as err:
-        _LOGGER.debug("Failed to fetch sensors: %s", err)
-        return False
-    return True
-
-
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Initialise Hue Bridge connection."""
-    data = HueSensorData(hass, async_add_entities)
-    await data.async_update_info()
-    async_track_time_interval(hass, data.async_update_info, SCAN_INTERVAL)
-
-
-class HueSensorData(object):
-    """Get the latest sensor data."""
-
-    def __init__(self, hass, async_add_entities):
-        """Initialize the data object."""
-        self.hass = hass
-        self.lock = threading.Lock()
-        self.data = {}
-        self.sensors = {}
-        self.async_add_entities = async_add_entities
-
-    async def update_bridge(self, bridge):
-        available = await update_api(bridge.api.sensors)
-        if not available:
-            return
-
-        data = parse_hue_api_response(
-            sensor.raw
-            for sensor in bridge.api.sensors.values()
-            if sensor.type != TYPE_GEOFENCE
+    data = get_sensor_data(hass)
+    data.async_configure(config)
+    data.async_add_platform(["RWL", "ZGP", "FOH"], HueSensor, async_add_entities)
+    for measurement, (models, *_) in MEASUREMENTS.items():
+        data.async_add_platform(
+            models, partial(HueMeasurementSensor, measurement), async_add_entities
         )
-
-        new_sensors = data.keys() - self.data.keys()
-        updated_sensors = []
-        for key, new in data.items():
-            new["changed"] = True
-            old = self.data.get(key)
-            if not old or old == new:
-                continue
-            updated_sensors.append(key)
-            if (
-                old["last_updated"] == new["last_updated"]
-                and old["state"] == new["state"]
-            ):
-                new["changed"] = False
-        self.data.update(data)
-
-        new_entities = {
-            entity_id: HueSensor(entity_id, self) for entity_id in new_sensors
-        }
-        if new_entities:
-            _LOGGER.debug("Created %s", ", ".join(new_entities.keys()))
-            self.sensors.update(new_entities)
-            self.async_add_entities(new_entities.values(), True)
-        for entity_id in updated_sensors:
-            self.sensors[entity_id].async_schedule_update_ha_state()
-
-    async def async_update_info(self, now=None):
-        """Get the bridge info."""
-        locked = self.lock.acquire(False)
-        if not locked:
-            return
-        try:
-            bridges = get_bridges(self.hass)
-            if not bridges:
-                if now:
-                    # periodic task
-                    await asyncio.sleep(5)
-                return
-            await asyncio.wait(
-                [self.update_bridge(bridge) for bridge in bridges], loop=self.hass.loop
-            )
-        finally:
-            self.lock.release()
+    if config.get(CONF_TELEMETRY):
+        data.async_enable_telemetry(HueBridgeTelemetrySensor, async_add_entities)
+    await data.async_start()
 
 
 class HueSensor(Entity):
@@ -251,7 +75,11 @@ class HueSensor(Entity):
     def __init__(self, hue_id, data):
         """Initialize the sensor object."""
         self._hue_id = hue_id
-        self._data = data.data  # data is in .data
+        self._data = data
+        self._record = data.data[hue_id]
+        self._unique_id = hue_id[+4:][:-3]
+        self._icon = ICONS.get(self._record.model, self.ICON)
+        self._device_class = DEVICE_CLASSES.get(self._record.model)
 
     @property
     def should_poll(self):
@@ -261,44 +89,146 @@ class HueSensor(Entity):
     @property
     def name(self):
         """Return the name of the sensor."""
-        data = self._data.get(self._hue_id)
-        if data:
-            return data["name"]
+        return self._record.name
 
     @property
     def unique_id(self):
         """Return the ID of this Hue sensor."""
-        return self._hue_id[+4:][:-3]
+        return self._unique_id
+
+    @property
+    def available(self):
+        """Return False while the bridge of the sensor is unreachable."""
+        return self._data.available(self._hue_id)
 
     @property
     def state(self):
         """Return the state of the sensor."""
-        data = self._data.get(self._hue_id)
-        if data and data["changed"]:
-            return data["state"]
+        if self._record.changed:
+            return self._record.state
 
     @property
     def icon(self):
         """Icon to use in the frontend, if any."""
-        data = self._data.get(self._hue_id)
-        if data:
-            icon = ICONS.get(data["model"])
-            if icon:
-                return icon
-        return self.ICON
+        return self._icon
 
     @property
     def device_class(self):
         """Return the class of this device, from component DEVICE_CLASSES."""
-        data = self._data.get(self._hue_id)
-        if data:
-            device_class = DEVICE_CLASSES.get(data["model"])
-            if device_class:
-                return device_class
+        return self._device_class
+
+    @property
+    def device_state_attributes(self):
+        """Attributes."""
+        return self._record.attributes
+
+    @callback
+    def async_record_updated(self):
+        """Write the state after the record of the sensor changed."""
+        self.async_write_ha_state()
+
+
+class HueMeasurementSensor(Entity):
+    """A measurement of a Hue sensor, like the temperature of a motion sensor."""
+
+    def __init__(self, measurement, hue_id, data):
+        """Initialize the sensor object."""
+        _, field, suffix, unit, device_class = MEASUREMENTS[measurement]
+        self._hue_id = hue_id
+        self._data = data
+        self._record = data.data[hue_id]
+        self._field = field
+        self._suffix = suffix
+        self._unique_id = "{}_{}".format(hue_id[+4:][:-3], measurement)
+        self._unit = unit
+        self._device_class = device_class
+        self._written = None
+
+    @property
+    def should_poll(self):
+        """No polling needed."""
+        return False
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return "{} {}".format(self._record.name, self._suffix)
+
+    @property
+    def unique_id(self):
+        """Return the ID of this sensor."""
+        return self._unique_id
+
+    @property
+    def available(self):
+        """Return False while the bridge of the sensor is unreachable."""
+        return self._data.available(self._hue_id)
+
+    @property
+    def state(self):
+        """Return the measured value, or None if the sensor has none."""
+        value = getattr(self._record, self._field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        return None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of the state."""
+        return self._unit
+
+    @property
+    def device_class(self):
+        """Return the class of this device."""
+        return self._device_class
+
+    async def async_added_to_hass(self):
+        """Remember the state written when the sensor was added."""
+        self._written = (self.state, self.available, self.name)
+
+    @callback
+    def async_record_updated(self):
+        """Write the state only if the measurement or availability moved."""
+        written = (self.state, self.available, self.name)
+        if written != self._written:
+            self._written = written
+            self.async_write_ha_state()
+
+
+class HueBridgeTelemetrySensor(Entity):
+    """Poll and event latency telemetry of a Hue bridge."""
+
+    def __init__(self, telemetry):
+        """Initialize the sensor object."""
+        self._telemetry = telemetry
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return "Hue bridge {} telemetry".format(self._telemetry.host)
+
+    @property
+    def unique_id(self):
+        """Return the ID of this sensor."""
+        return "huesensor_telemetry_{}".format(self._telemetry.host)
+
+    @property
+    def state(self):
+        """Return the last round trip time of a poll."""
+        if self._telemetry.last_round_trip is not None:
+            return round(self._telemetry.last_round_trip, 1)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of the state."""
+        return "ms"
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return "mdi:speedometer"
 
     @property
     def device_state_attributes(self):
         """Attributes."""
-        data = self._data.get(self._hue_id)
-        if data:
-            return {key: data.get(key) for key in ATTRS.get(data["model"], [])}
+        return self._telemetry.as_dict()
@@ -0,0 +1,124 @@
+"""Poll and event latency telemetry of a Hue bridge."""
+
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets, in milliseconds.
+ROUND_TRIP_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+EVENT_DELAY_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+
+
+class Histogram(object):
+    """Count values in fixed buckets."""
+
+    def __init__(self, bounds):
+        """Initialize with the upper bounds of the buckets."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        """Count a value."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+
+    def quantile(self, fraction):
+        """Return the upper bound of the bucket holding the quantile."""
+        if not self.total:
+            return None
+        rank = fraction * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        """Return the bucket counts keyed by their upper bound."""
+        buckets = {
+            "<={}".format(bound): n for bound, n in zip(self.bounds, self.counts)
+        }
+        buckets[">{}".format(self.bounds[-1])] = self.counts[-1]
+        return buckets
+
+
+class BridgeTelemetry(object):
+    """Counters and timings of the polling of one bridge.
+
+    Durations are passed in seconds and reported in milliseconds.
+    """
+
+    def __init__(self, host):
+        """Initialize the telemetry of the bridge at host."""
+        self.host = host
+        self.polls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.joined_ticks = 0
+        self.throttled = 0
+        self.round_trip = Histogram(ROUND_TRIP_BUCKETS)
+        self.last_round_trip = None
+        self.last_parse = None
+        self.max_parse = 0
+        self.total_parse = 0
+        self.parses = 0
+        self.event_delay = Histogram(EVENT_DELAY_BUCKETS)
+        self.last_event_delay = None
+
+    def request_done(self, seconds):
+        """Record a successful request and its round trip time."""
+        self.polls += 1
+        self.last_round_trip = seconds * 1000
+        self.round_trip.observe(self.last_round_trip)
+
+    def request_failed(self, timeout):
+        """Record a failed request."""
+        if timeout:
+            self.timeouts += 1
+        else:
+            self.errors += 1
+
+    def request_throttled(self):
+        """Record a fetch held back to stay within the request budget."""
+        self.throttled += 1
+
+    def tick_joined(self):
+        """Record a tick that joined a request still in flight."""
+        self.joined_ticks += 1
+
+    def parsed(self, seconds):
+        """Record the time spent parsing and diffing a response."""
+        self.last_parse = seconds * 1000
+        self.max_parse = max(self.max_parse, self.last_parse)
+        self.total_parse += self.last_parse
+        self.parses += 1
+
+    def state_written(self, seconds):
+        """Record the delay from the bridge lastupdated to our state write.
+
+        lastupdated has a resolution of one second, so are these delays.
+        """
+        self.last_event_delay = seconds * 1000
+        self.event_delay.observe(self.last_event_delay)
+
+    def as_dict(self):
+        """Return the telemetry as state attributes."""
+        return {
+            "polls": self.polls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "joined_ticks": self.joined_ticks,
+            "throttled": self.throttled,
+            "round_trip_ms": self.last_round_trip,
+            "round_trip_p50_ms": self.round_trip.quantile(0.5),
+            "round_trip_p90_ms": self.round_trip.quantile(0.9),
+            "round_trip_p99_ms": self.round_trip.quantile(0.99),
+            "round_trip_histogram": self.round_trip.as_dict(),
+            "parse_ms": self.last_parse,
+            "parse_max_ms": self.max_parse,
+            "parse_mean_ms": self.total_parse / self.parses if self.parses else None,
+            "event_delay_ms": self.last_event_delay,
+            "event_delay_p50_ms": self.event_delay.quantile(0.5),
+            "event_delay_p90_ms": self.event_delay.quantile(0.9),
+            "event_delay_histogram": self.event_delay.as_dict(),
+        }